@@ -1,19 +1,53 @@
 import os
+import json
+import atexit
+import hashlib
+import hmac
 import logging
+import re
+import time
+import uuid
 from functools import wraps
 from datetime import datetime
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+import click
+from flask import Flask, Response, abort, g, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event
+from sqlalchemy.orm import DeclarativeBase, Session
 from werkzeug.middleware.proxy_fix import ProxyFix
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from utils.perplexity_client import get_chat_response
-from utils.nlp_processor import preprocess_query
+from utils.log_config import configure_logging
+
+# Configure logging before importing modules that log while loading
+configure_logging()
+
+from utils.perplexity_client import (
+    CircuitBreaker, RemoteChatBackend, configure_remote_backend, get_chat_response, remote_backend_stats,
+)
+from utils.nlp_processor import preprocess_query, strip_query_context
+from utils.local_knowledge_base import get_relevant_info
+from utils import knowledge_state
+from utils.knowledge_state import KNOWLEDGE_BASE_SNAPSHOT_PATH, KnowledgeBaseWatcher, build_snapshot, on_knowledge_base_reload
+from utils.response_cache import LRUCache, make_cache_key, normalize_query
+from utils.routing import LOCAL, REMOTE, ConfidenceRouter, RouteDecision, evaluate_routing
+from utils.schema import upgrade_schema
+from utils.single_flight import SingleFlight
+from utils.write_behind import WriteBehindQueue
+from utils.conversation_store import ConversationStore
+from utils.user_cache import UserCache
+from utils.timing import stage_timer
+from utils.metrics import MetricsRegistry
+from utils.rate_limit import ConcurrencyLimiter, RateLimiter, create_bucket_store
+from utils.passwords import MIN_SCRYPT_N, PasswordHasher, PasswordHasherBusy, calibrate_scrypt_n
+from utils.pagination import decode_cursor, encode_cursor, parse_page_size
+from utils.query_budget import install_statement_budget, statement_budget
+from utils.query_plans import check_query_plans, hot_query
+from utils.stats import (
+    StatsReconciler, active_users_statement, get_dashboard_stats, reconcile_stats, record_chat_queries,
+    record_user_created, stats_need_bootstrap,
+)
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
@@ -23,11 +57,11 @@ db = SQLAlchemy(model_class=Base)
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)  # needed for url_for to generate with https
 
 # Configure the database using PostgreSQL
 database_url = os.environ.get("DATABASE_URL")
-logger.info(f"Database URL: {database_url}")
+logger.info("Database URL: %s", database_url)
 if not database_url:
     logger.error("DATABASE_URL environment variable is not set")
     database_url = "sqlite:///chatbot.db"  # Fallback to SQLite
@@ -37,23 +71,364 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
+# Response cache for /api/chat; 0 disables it
+app.config["CHAT_CACHE_SIZE"] = int(os.environ.get("CHAT_CACHE_SIZE", "1024"))
+# Number of trailing history entries that are part of the cache key
+app.config["CHAT_CACHE_HISTORY_TURNS"] = int(os.environ.get("CHAT_CACHE_HISTORY_TURNS", "4"))
+# Concurrent cache misses for the same question share one computation of the answer
+app.config["CHAT_SINGLE_FLIGHT"] = os.environ.get("CHAT_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+# Write-behind mode queues ChatQuery inserts and bulk-writes them off the request path
+app.config["CHAT_WRITE_BEHIND"] = os.environ.get("CHAT_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+app.config["CHAT_WRITE_BATCH_SIZE"] = int(os.environ.get("CHAT_WRITE_BATCH_SIZE", "100"))
+app.config["CHAT_WRITE_FLUSH_INTERVAL"] = float(os.environ.get("CHAT_WRITE_FLUSH_INTERVAL", "1.0"))
+app.config["CHAT_WRITE_QUEUE_SIZE"] = int(os.environ.get("CHAT_WRITE_QUEUE_SIZE", "10000"))
+app.config["CHAT_WRITE_PUT_TIMEOUT"] = float(os.environ.get("CHAT_WRITE_PUT_TIMEOUT", "0.5"))
+
+# Bulk question answering on /api/chat/batch, for logged-in users and partners
+# holding one of the comma-separated keys; larger batches must use the NDJSON stream
+app.config["CHAT_BATCH_API_KEYS"] = [key.strip() for key in os.environ.get("CHAT_BATCH_API_KEYS", "").split(",") if key.strip()]
+app.config["CHAT_BATCH_MAX_ITEMS"] = int(os.environ.get("CHAT_BATCH_MAX_ITEMS", "50"))
+app.config["CHAT_BATCH_MAX_STREAM_ITEMS"] = int(os.environ.get("CHAT_BATCH_MAX_STREAM_ITEMS", "500"))
+app.config["CHAT_BATCH_MAX_MESSAGE_LENGTH"] = int(os.environ.get("CHAT_BATCH_MAX_MESSAGE_LENGTH", "4000"))
+# Streamed batches are answered, stored and sent this many items at a time
+app.config["CHAT_BATCH_CHUNK_SIZE"] = int(os.environ.get("CHAT_BATCH_CHUNK_SIZE", "50"))
+
+# Server-side conversation windows, so clients only send the new message. They are held in
+# each worker's memory: run one worker per instance (gunicorn's default, scaling with --threads
+# as in .replit), or follow-up questions that reach another worker start without their history
+app.config["CONVERSATION_MAX_TURNS"] = int(os.environ.get("CONVERSATION_MAX_TURNS", "10"))
+app.config["CONVERSATION_TTL"] = float(os.environ.get("CONVERSATION_TTL", "1800"))
+app.config["CONVERSATION_MAX_COUNT"] = int(os.environ.get("CONVERSATION_MAX_COUNT", "10000"))
+
+# Seconds between full reconciliations of the dashboard statistics, shared by all workers; 0 disables
+# them, for deployments that run `flask reconcile-stats` from cron instead
+app.config["STATS_RECONCILE_INTERVAL"] = float(os.environ.get("STATS_RECONCILE_INTERVAL", "3600"))
+
+# Log a warning at startup for any hot query whose plan scans a whole table
+app.config["CHECK_QUERY_PLANS"] = os.environ.get("CHECK_QUERY_PLANS", "").lower() in ("1", "true", "yes")
+
+# Per-request SQL statement budgets: "off", "warn" (log) or "raise" (fail the request)
+app.config["SQL_STATEMENT_BUDGET_MODE"] = os.environ.get("SQL_STATEMENT_BUDGET_MODE", "off").lower()
+app.config["SQL_STATEMENT_BUDGET"] = int(os.environ.get("SQL_STATEMENT_BUDGET", "20"))
+
+# Per-process cache of logged-in users; changes in other workers show up within the TTL
+app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", "30"))
+app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+
+# Password hashing: cost calibrated to a target latency, run on a bounded per-process pool.
+# Sheds load only with threaded workers (gunicorn --worker-class gthread, as in .replit);
+# MAX_PENDING must stay below --threads to take effect
+app.config["PASSWORD_HASH_TARGET_MS"] = float(os.environ.get("PASSWORD_HASH_TARGET_MS", "100"))
+app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "4"))
+app.config["PASSWORD_HASH_QUEUE_TIMEOUT"] = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", "2.0"))
+
+# Token-bucket rate limits per user (or per IP when logged out), and a cap on concurrent chat requests
+app.config["RATE_LIMIT_ENABLED"] = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config["RATE_LIMIT_STORE"] = os.environ.get("RATE_LIMIT_STORE", "memory")
+app.config["RATE_LIMIT_CHAT_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_CHAT_PER_MINUTE", "30"))
+app.config["RATE_LIMIT_CHAT_BURST"] = float(os.environ.get("RATE_LIMIT_CHAT_BURST", "10"))
+app.config["RATE_LIMIT_LOGIN_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_LOGIN_PER_MINUTE", "10"))
+app.config["RATE_LIMIT_LOGIN_BURST"] = float(os.environ.get("RATE_LIMIT_LOGIN_BURST", "5"))
+app.config["RATE_LIMIT_FEEDBACK_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_FEEDBACK_PER_MINUTE", "30"))
+app.config["RATE_LIMIT_FEEDBACK_BURST"] = float(os.environ.get("RATE_LIMIT_FEEDBACK_BURST", "10"))
+# Batch partners are charged per distinct question, like users, but with their own larger bucket
+app.config["RATE_LIMIT_PARTNER_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_PARTNER_PER_MINUTE", "300"))
+app.config["RATE_LIMIT_PARTNER_BURST"] = float(os.environ.get("RATE_LIMIT_PARTNER_BURST", "500"))
+# Chat requests each worker process serves at once; the cap is per process (the server-wide
+# limit is this times the gunicorn worker count) and must stay below --threads (8 in .replit)
+# so chat cannot occupy every thread and starve login, static files and /admin
+app.config["CHAT_MAX_CONCURRENCY"] = int(os.environ.get("CHAT_MAX_CONCURRENCY", "6"))
+
+# Per-stage timing of the chat pipeline; can also be switched at runtime from /admin/timing
+app.config["STAGE_TIMING"] = os.environ.get("STAGE_TIMING", "true").lower() in ("1", "true", "yes")
+
+# Directory for the per-process metrics files aggregated by /metrics; defaults to one per gunicorn master
+app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR")
+
+# Remote answer backend (an OpenAI-style chat completions API); "local" answers from the knowledge base only
+app.config["ANSWER_BACKEND"] = os.environ.get("ANSWER_BACKEND", "local").lower()
+app.config["REMOTE_BACKEND_URL"] = os.environ.get("REMOTE_BACKEND_URL", "https://api.perplexity.ai/chat/completions")
+app.config["REMOTE_BACKEND_API_KEY"] = os.environ.get("PERPLEXITY_API_KEY")
+app.config["REMOTE_BACKEND_MODEL"] = os.environ.get("REMOTE_BACKEND_MODEL", "sonar")
+app.config["REMOTE_BACKEND_CONNECT_TIMEOUT"] = float(os.environ.get("REMOTE_BACKEND_CONNECT_TIMEOUT", "2.0"))
+app.config["REMOTE_BACKEND_READ_TIMEOUT"] = float(os.environ.get("REMOTE_BACKEND_READ_TIMEOUT", "8.0"))
+# Seconds a question may spend on the remote backend, retries included, before falling back;
+# keep it well under the gunicorn worker timeout (30s by default)
+app.config["REMOTE_BACKEND_DEADLINE"] = float(os.environ.get("REMOTE_BACKEND_DEADLINE", "12.0"))
+app.config["REMOTE_BACKEND_MAX_RETRIES"] = int(os.environ.get("REMOTE_BACKEND_MAX_RETRIES", "2"))
+app.config["REMOTE_BACKEND_POOL_SIZE"] = int(os.environ.get("REMOTE_BACKEND_POOL_SIZE", "10"))
+# Consecutive failures that open the circuit, and seconds before it is tried again
+app.config["REMOTE_BACKEND_FAILURE_THRESHOLD"] = int(os.environ.get("REMOTE_BACKEND_FAILURE_THRESHOLD", "5"))
+app.config["REMOTE_BACKEND_RESET_TIMEOUT"] = float(os.environ.get("REMOTE_BACKEND_RESET_TIMEOUT", "30"))
+# With a remote backend, answer locally when retrieval is confident: a query naming a topic needs
+# ROUTER_MIN_TOPIC_SCORE, any other query ROUTER_MIN_SCORE (BM25 score of the best passage)
+app.config["ROUTER_ENABLED"] = os.environ.get("ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config["ROUTER_MIN_SCORE"] = float(os.environ.get("ROUTER_MIN_SCORE", "5.0"))
+app.config["ROUTER_MIN_TOPIC_SCORE"] = float(os.environ.get("ROUTER_MIN_TOPIC_SCORE", "1.0"))
+
+# Seconds between checks of the knowledge base file for changes; 0 disables hot reload
+app.config["KB_RELOAD_INTERVAL"] = float(os.environ.get("KB_RELOAD_INTERVAL", "5"))
+
+# Chat history pagination on /profile
+app.config["PROFILE_PAGE_SIZE"] = int(os.environ.get("PROFILE_PAGE_SIZE", "20"))
+app.config["PROFILE_MAX_PAGE_SIZE"] = 100
+
 # initialize the app with the extension
 db.init_app(app)
 
+response_cache = LRUCache(app.config["CHAT_CACHE_SIZE"])
+chat_flights = SingleFlight(enabled=app.config["CHAT_SINGLE_FLIGHT"])
+
+router = ConfidenceRouter(
+    min_score=app.config["ROUTER_MIN_SCORE"],
+    min_topic_score=app.config["ROUTER_MIN_TOPIC_SCORE"],
+)
+
+if app.config["ANSWER_BACKEND"] == "remote":
+    configure_remote_backend(RemoteChatBackend(
+        url=app.config["REMOTE_BACKEND_URL"],
+        api_key=app.config["REMOTE_BACKEND_API_KEY"],
+        model=app.config["REMOTE_BACKEND_MODEL"],
+        connect_timeout=app.config["REMOTE_BACKEND_CONNECT_TIMEOUT"],
+        read_timeout=app.config["REMOTE_BACKEND_READ_TIMEOUT"],
+        deadline=app.config["REMOTE_BACKEND_DEADLINE"],
+        max_retries=app.config["REMOTE_BACKEND_MAX_RETRIES"],
+        pool_size=app.config["REMOTE_BACKEND_POOL_SIZE"],
+        breaker=CircuitBreaker(
+            failure_threshold=app.config["REMOTE_BACKEND_FAILURE_THRESHOLD"],
+            reset_timeout=app.config["REMOTE_BACKEND_RESET_TIMEOUT"],
+        ),
+    ))
+conversations = ConversationStore(
+    max_conversations=app.config["CONVERSATION_MAX_COUNT"],
+    max_turns=app.config["CONVERSATION_MAX_TURNS"],
+    ttl=app.config["CONVERSATION_TTL"],
+)
+
+@on_knowledge_base_reload
+def _invalidate_response_cache(new_state):
+    """Free the answers from the previous knowledge base; their keys can no longer match."""
+    response_cache.clear()
+
+password_hasher = PasswordHasher(
+    n=calibrate_scrypt_n(app.config["PASSWORD_HASH_TARGET_MS"] / 1000)
+    if app.config["PASSWORD_HASH_TARGET_MS"] > 0 else MIN_SCRYPT_N,
+    max_workers=app.config["PASSWORD_HASH_WORKERS"],
+    max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+    queue_timeout=app.config["PASSWORD_HASH_QUEUE_TIMEOUT"],
+)
+
+metrics = MetricsRegistry(app.config["METRICS_DIR"])
+http_requests_total = metrics.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status.', ['endpoint', 'method', 'status'])
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by endpoint.', ['endpoint'])
+chat_cache_lookups_total = metrics.counter(
+    'chat_response_cache_lookups_total', 'Chat response cache lookups by result.', ['result'])
+db_commit_duration = metrics.histogram(
+    'db_commit_duration_seconds', 'Time to flush and commit a database session.')
+chat_coalesced_requests_total = metrics.counter(
+    'chat_coalesced_requests_total', 'Chat requests answered by waiting on an identical in-flight request.')
+chat_route_decisions_total = metrics.counter(
+    'chat_route_decisions_total', 'Chat answers by the backend chosen to produce them.', ['backend'])
+feedback_submissions_total = metrics.counter(
+    'feedback_submissions_total', 'Feedback submissions by rating.', ['rating'])
+chat_requests_in_flight = metrics.gauge(
+    'chat_requests_in_flight', 'Chat requests being answered across live workers.')
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    # Unmatched URLs share one label so scanners cannot create unbounded series
+    endpoint = request.endpoint or 'unmatched'
+    http_requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if 'request_started' in g:
+        http_request_duration.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    return response
+
+@event.listens_for(Session, 'before_commit')
+def _start_commit_timer(db_session):
+    db_session.info['commit_started'] = time.perf_counter()
+
+@event.listens_for(Session, 'after_commit')
+def _record_commit_duration(db_session):
+    started = db_session.info.pop('commit_started', None)
+    if started is not None:
+        db_commit_duration.observe(time.perf_counter() - started)
+
+rate_limiter = RateLimiter(create_bucket_store(app.config["RATE_LIMIT_STORE"]), enabled=app.config["RATE_LIMIT_ENABLED"])
+rate_limiter.add_limit('chat', app.config["RATE_LIMIT_CHAT_PER_MINUTE"], app.config["RATE_LIMIT_CHAT_BURST"])
+rate_limiter.add_limit('login', app.config["RATE_LIMIT_LOGIN_PER_MINUTE"], app.config["RATE_LIMIT_LOGIN_BURST"])
+rate_limiter.add_limit('feedback', app.config["RATE_LIMIT_FEEDBACK_PER_MINUTE"], app.config["RATE_LIMIT_FEEDBACK_BURST"])
+rate_limiter.add_limit('chat_partner', app.config["RATE_LIMIT_PARTNER_PER_MINUTE"], app.config["RATE_LIMIT_PARTNER_BURST"])
+chat_concurrency = ConcurrencyLimiter(app.config["CHAT_MAX_CONCURRENCY"], in_flight_gauge=chat_requests_in_flight)
+
+def _client_key():
+    """Rate limit key: the user ID when logged in, otherwise the client IP."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+def _login_attempt_key():
+    """Only form submissions count towards the login limit, keyed by client IP."""
+    return f"ip:{request.remote_addr}" if request.method == 'POST' else None
+
+@app.errorhandler(429)
+@app.errorhandler(503)
+def _overloaded(error):
+    """Answer API clients in JSON; pages get Werkzeug's default error page."""
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': error.description})
+        response.status_code = error.code
+        if getattr(error, 'retry_after', None):
+            response.headers['Retry-After'] = str(error.retry_after)
+        return response
+    return error
+
+stage_timer.enabled = app.config["STAGE_TIMING"]
+stage_timer.install(app)
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+def _load_user_record(user_id):
+    from models import User
+    return db.session.get(User, user_id)
+
+user_cache = UserCache(
+    _load_user_record,
+    maxsize=app.config["USER_CACHE_SIZE"],
+    ttl=app.config["USER_CACHE_TTL"],
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    """Return a read-only snapshot of the user, cached for USER_CACHE_TTL seconds."""
+    return user_cache.get(int(user_id))
 
 with app.app_context():
     # Make sure to import the models here
     import models  # noqa: F401
     db.create_all()
+    user_cache.invalidate_on_change(models.User)
+    
+    # create_all skips tables that already exist, so add columns declared later
+    upgrade_schema(db.engine)
+    
+    # and the indexes, some of which cover those columns
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    
+    install_statement_budget(
+        app, db.engine,
+        mode=app.config["SQL_STATEMENT_BUDGET_MODE"],
+        default_limit=app.config["SQL_STATEMENT_BUDGET"],
+    )
+    
+    # Compute the statistics rollups the first time the app runs against a database
+    if stats_need_bootstrap(db.session):
+        reconcile_stats(db.session)
+
+@app.cli.command('build-kb-snapshot')
+def build_kb_snapshot_command():
+    """Compile the knowledge base JSON into the snapshot loaded at startup."""
+    state = build_snapshot()
+    print(f"Wrote knowledge base {state.version} to {KNOWLEDGE_BASE_SNAPSHOT_PATH}")
+
+stats_reconciler = StatsReconciler(app, db.session, app.config["STATS_RECONCILE_INTERVAL"])
+
+@app.before_request
+def _start_stats_reconciler():
+    """Start the reconciliation thread in each worker process; one of them reconciles each interval."""
+    stats_reconciler.ensure_started()
+
+knowledge_base_watcher = KnowledgeBaseWatcher(interval=app.config["KB_RELOAD_INTERVAL"])
+
+@app.before_request
+def _start_knowledge_base_watcher():
+    """Watch the knowledge base file from each worker process."""
+    knowledge_base_watcher.ensure_started()
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN the hot queries and fail if any of them scans a whole table."""
+    findings = check_query_plans(db.session)
+    for name, problems in findings.items():
+        for problem in problems:
+            print(f"{name}: {problem}")
+    if findings:
+        raise SystemExit(1)
+    print("All query plans use indexes")
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recompute the dashboard statistics from the source tables."""
+    reconcile_stats(db.session)
+
+@app.cli.command('evaluate-routing')
+@click.option('--limit', default=10000, help='Number of most recent chat queries to replay.')
+@click.option('--remote-latency-ms', default=1500.0, help='Assumed latency of one remote backend call.')
+@click.option('--min-score', type=float, default=None, help='Override ROUTER_MIN_SCORE.')
+@click.option('--min-topic-score', type=float, default=None, help='Override ROUTER_MIN_TOPIC_SCORE.')
+def evaluate_routing_command(limit, remote_latency_ms, min_score, min_topic_score):
+    """Replay stored chat queries through the router and estimate remote calls and latency saved."""
+    from models import ChatQuery
+    from sqlalchemy import select
+    candidate = ConfidenceRouter(
+        min_score=app.config["ROUTER_MIN_SCORE"] if min_score is None else min_score,
+        min_topic_score=app.config["ROUTER_MIN_TOPIC_SCORE"] if min_topic_score is None else min_topic_score,
+    )
+    rows = db.session.scalars(
+        select(ChatQuery.query_text).order_by(ChatQuery.timestamp.desc(), ChatQuery.id.desc()).limit(limit)
+    )
+    result = evaluate_routing(
+        (strip_query_context(text) for text in rows), candidate, get_relevant_info, remote_latency_ms
+    )
+    print(json.dumps({'min_score': candidate.min_score, 'min_topic_score': candidate.min_topic_score, **result},
+                     indent=2))
+
+def _insert_chat_queries(rows):
+    """Bulk-insert queued ChatQuery rows in one statement."""
+    from models import ChatQuery
+    from sqlalchemy import insert
+    with app.app_context():
+        db.session.execute(insert(ChatQuery), rows)
+        record_chat_queries(db.session, [row['user_id'] for row in rows])
+        db.session.commit()
+
+chat_writer = WriteBehindQueue(
+    _insert_chat_queries,
+    batch_size=app.config["CHAT_WRITE_BATCH_SIZE"],
+    flush_interval=app.config["CHAT_WRITE_FLUSH_INTERVAL"],
+    max_queue=app.config["CHAT_WRITE_QUEUE_SIZE"],
+    put_timeout=app.config["CHAT_WRITE_PUT_TIMEOUT"],
+)
+atexit.register(chat_writer.stop)
+
+# Public ids are uuid4().hex
+_PUBLIC_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+def _find_chat_query(query_id):
+    """Look up a ChatQuery by its integer id or its public id."""
+    from models import ChatQuery
+    if isinstance(query_id, int) or str(query_id).isdigit():
+        return ChatQuery.query.get(int(query_id))
+
+    query = db.session.scalars(_feedback_lookup_statement(str(query_id))).first()
+    # Only an id we could have issued is worth a flush; anything else cannot be queued
+    if query is None and app.config["CHAT_WRITE_BEHIND"] and _PUBLIC_ID_PATTERN.fullmatch(str(query_id)):
+        # The record may still be waiting in the write-behind queue
+        chat_writer.flush()
+        query = db.session.scalars(_feedback_lookup_statement(str(query_id))).first()
+    return query
 
 @app.route('/')
 def index():
@@ -99,15 +474,22 @@ def register():
                 flash('Email already exists', 'danger')
             return render_template('register.html')
         
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            flash('We are receiving a lot of requests right now. Please try again in a moment.', 'warning')
+            return render_template('register.html'), 503
+        
         # Create new user
         new_user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hash
         )
         
         # Add to database
         db.session.add(new_user)
+        record_user_created(db.session)
         db.session.commit()
         
         # Log in the new user
@@ -118,12 +500,18 @@ def register():
     
     return render_template('register.html')
 
+@hot_query('login_user_by_username')
+def _user_by_username_statement(username=''):
+    """Build the lookup of a user by username at login."""
+    from models import User
+    from sqlalchemy import select
+    return select(User).where(User.username == username)
+
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limiter.limit('login', _login_attempt_key)
 def login():
     """Handle user login."""
     if request.method == 'POST':
-        from models import User
-        
         username = request.form.get('username')
         password = request.form.get('password')
         
@@ -133,10 +521,24 @@ def login():
             return render_template('login.html')
         
         # Find the user
-        user = User.query.filter_by(username=username).first()
+        user = db.session.scalars(_user_by_username_statement(username)).first()
         
         # Verify credentials
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and password_hasher.verify(user.password_hash, password)
+        except PasswordHasherBusy:
+            flash('We are receiving a lot of requests right now. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
+        
+        if valid:
+            # Upgrade hashes made with an older method or a lower cost
+            if password_hasher.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = password_hasher.hash(password)
+                    db.session.commit()
+                except PasswordHasherBusy:
+                    logger.info("Skipped rehashing the password of user %s; hasher busy", user.id)
+            
             login_user(user)
             flash('Logged in successfully! Welcome back.', 'success')
             
@@ -158,16 +560,115 @@ def logout():
     flash('Logged out successfully!', 'success')
     return redirect(url_for('index'))
 
+# Length of the query and response previews in the history list, ellipsis included
+HISTORY_QUERY_PREVIEW_CHARS = 300
+HISTORY_RESPONSE_PREVIEW_CHARS = 200
+
+def _preview(text, length):
+    """Shorten text to at most ``length`` characters at a word boundary, ending with "..."."""
+    if text is None or len(text) <= length:
+        return text
+    return text[:length - 3].rsplit(' ', 1)[0] + '...'
+
+def _chat_history_statement(user_id, position, limit):
+    """Build the keyset query for a page of a user's chat history."""
+    from models import ChatQuery
+    from sqlalchemy import func, select, tuple_
+    
+    # One character past each preview shows whether the text needs shortening
+    statement = select(
+        ChatQuery.id,
+        ChatQuery.timestamp,
+        func.substr(ChatQuery.query_text, 1, HISTORY_QUERY_PREVIEW_CHARS + 1).label('query_text'),
+        func.substr(ChatQuery.response_text, 1, HISTORY_RESPONSE_PREVIEW_CHARS + 1).label('response_preview'),
+        ChatQuery.has_feedback,
+        ChatQuery.feedback_rating,
+        ChatQuery.feedback_comments,
+        ChatQuery.feedback_timestamp,
+    ).where(ChatQuery.user_id == user_id)
+    
+    if position:
+        statement = statement.where(tuple_(ChatQuery.timestamp, ChatQuery.id) < tuple_(*position))
+    
+    return statement.order_by(ChatQuery.timestamp.desc(), ChatQuery.id.desc()).limit(limit)
+
+hot_query('profile_history_first_page', index='ix_chat_query_user_id_timestamp')(
+    lambda: _chat_history_statement(1, None, 21))
+hot_query('profile_history_next_page', index='ix_chat_query_user_id_timestamp')(
+    lambda: _chat_history_statement(1, (datetime(2025, 1, 1), 1000), 21))
+
+def _chat_history_page(user_id, cursor, page_size):
+    """
+    Fetch one page of a user's chat history, most recent first.
+
+    Uses keyset pagination on (timestamp, id), so each page costs the same
+    regardless of how deep into the history it is, and loads only truncated
+    previews of the text columns.
+
+    The previews are shortened here, once, for both the profile page and the
+    JSON history API.
+
+    Returns:
+        A (items, next_cursor) tuple of history item dicts; next_cursor is
+        None on the last page
+    """
+    # Fetch one extra row to learn whether another page follows
+    statement = _chat_history_statement(user_id, decode_cursor(cursor), page_size + 1)
+    rows = db.session.execute(statement).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    items = [
+        {
+            **row._asdict(),
+            'query_text': _preview(row.query_text, HISTORY_QUERY_PREVIEW_CHARS),
+            'response_preview': _preview(row.response_preview, HISTORY_RESPONSE_PREVIEW_CHARS),
+        }
+        for row in rows
+    ]
+    return items, next_cursor
+
 @app.route('/profile')
+@statement_budget(4)
 @login_required
 def profile():
-    """Display user profile and chat history."""
-    from models import ChatQuery
+    """Display user profile and the first page of chat history."""
+    from models import UserQueryCount
     
-    # Get user's chat history, ordered by most recent
-    chat_history = ChatQuery.query.filter_by(user_id=current_user.id).order_by(ChatQuery.timestamp.desc()).all()
+    page_size = parse_page_size(request.args.get('limit'), app.config["PROFILE_PAGE_SIZE"], app.config["PROFILE_MAX_PAGE_SIZE"])
+    chat_history, next_cursor = _chat_history_page(current_user.id, request.args.get('cursor'), page_size)
     
-    return render_template('profile.html', chat_history=chat_history)
+    query_count = db.session.get(UserQueryCount, current_user.id)
+    total_queries = query_count.query_count if query_count else 0
+    
+    return render_template(
+        'profile.html',
+        chat_history=chat_history,
+        next_cursor=next_cursor,
+        total_queries=total_queries
+    )
+
+@app.route('/api/profile/history')
+@statement_budget(3)
+@login_required
+def profile_history():
+    """Return a page of the current user's chat history for infinite scroll."""
+    page_size = parse_page_size(request.args.get('limit'), app.config["PROFILE_PAGE_SIZE"], app.config["PROFILE_MAX_PAGE_SIZE"])
+    items, next_cursor = _chat_history_page(current_user.id, request.args.get('cursor'), page_size)
+    
+    return jsonify({
+        'items': [
+            {
+                **item,
+                'timestamp': item['timestamp'].isoformat(),
+                'has_feedback': bool(item['has_feedback']),
+                'feedback_timestamp': item['feedback_timestamp'].isoformat() if item['feedback_timestamp'] else None,
+            }
+            for item in items
+        ],
+        'next_cursor': next_cursor
+    })
 
 def admin_required(f):
     """Decorator for routes that require admin access."""
@@ -179,38 +680,143 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@hot_query('admin_recent_queries', index='ix_chat_query_timestamp')
+def _recent_queries_statement(limit=20):
+    """Build the query for the most recent chat queries across all users."""
+    from models import ChatQuery
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+    # The dashboard shows each query's user, so load them in the same statement
+    return (
+        select(ChatQuery)
+        .options(joinedload(ChatQuery.user))
+        .order_by(ChatQuery.timestamp.desc(), ChatQuery.id.desc())
+        .limit(limit)
+    )
+
+@hot_query('feedback_by_public_id', index='ix_chat_query_public_id')
+def _feedback_lookup_statement(public_id='0' * 32):
+    """Build the lookup of a chat query by the public id sent with feedback."""
+    from models import ChatQuery
+    from sqlalchemy import select
+    return select(ChatQuery).where(ChatQuery.public_id == public_id)
+
+hot_query('admin_active_users')(active_users_statement)
+
 @app.route('/admin')
+@statement_budget(5)
 @login_required
 @admin_required
 def admin_dashboard():
     """Admin dashboard for system analytics."""
-    from models import User, ChatQuery
-    from sqlalchemy import func
-    
-    # Get basic stats
-    total_users = User.query.count()
-    total_queries = ChatQuery.query.count()
+    # Get basic stats and the most active users from the maintained rollups
+    stats = get_dashboard_stats(db.session)
     
     # Get recent queries for analytics
-    recent_queries = ChatQuery.query.order_by(ChatQuery.timestamp.desc()).limit(20).all()
-    
-    # Get most active users
-    active_users = db.session.query(
-        User, func.count(ChatQuery.id).label('query_count')
-    ).join(User.queries).group_by(User).order_by(func.count(ChatQuery.id).desc()).limit(5).all()
+    recent_queries = db.session.scalars(_recent_queries_statement()).all()
     
     # Get common query terms (simplified)
     # In a real system, you might want to use NLP or more sophisticated analysis
     
     return render_template(
         'admin/dashboard.html',
-        total_users=total_users,
-        total_queries=total_queries,
+        total_users=stats['total_users'],
+        total_queries=stats['total_queries'],
         recent_queries=recent_queries,
-        active_users=active_users
+        active_users=stats['active_users']
     )
 
+@app.route('/admin/cache')
+@login_required
+@admin_required
+def admin_cache_stats():
+    """Report response cache counters, how many chat requests were coalesced and user cache hits."""
+    return jsonify({
+        **response_cache.stats(),
+        'single_flight': chat_flights.stats(),
+        'user_cache': user_cache.stats(),
+    })
+
+@app.route('/admin/writes')
+@login_required
+@admin_required
+def admin_write_stats():
+    """Report the chat write-behind queue depth and write counters for this worker."""
+    return jsonify({'enabled': app.config["CHAT_WRITE_BEHIND"], **chat_writer.stats(), 'pid': os.getpid()})
+
+@app.route('/admin/backend')
+@login_required
+@admin_required
+def admin_backend_stats():
+    """Report remote answer backend calls, retries, circuit breaker state and routing decisions."""
+    return jsonify({**remote_backend_stats(), 'routing': {'enabled': app.config["ROUTER_ENABLED"], **router.stats()}})
+
+@app.route('/admin/knowledge-base', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_knowledge_base():
+    """
+    Report the loaded knowledge base version; POST reloads it in this worker.
+
+    Other workers pick up the change from the file within KB_RELOAD_INTERVAL.
+    Pass force=true to rebuild even when the file is unchanged.
+    """
+    reloaded = False
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        reloaded = knowledge_state.reload_knowledge_base(force=bool(data.get('force'))) is not None
+    state = knowledge_state.current()
+    return jsonify({
+        'version': state.version,
+        'source_version': knowledge_state.source_version(),
+        'passages': len(state.index.passages),
+        'reloaded': reloaded,
+        'pid': os.getpid(),
+    })
+
+@app.route('/admin/rate-limits')
+@login_required
+@admin_required
+def admin_rate_limit_stats():
+    """Report rate limit decisions, chat concurrency and password hashing work for this worker."""
+    return jsonify({
+        'rate_limits': rate_limiter.stats(),
+        'chat_concurrency': chat_concurrency.stats(),
+        'password_hashing': password_hasher.stats(),
+    })
+
+@app.route('/admin/timing', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_stage_timing():
+    """
+    Report chat pipeline stage latencies for this worker.
+
+    POST {"enabled": bool} switches timing on or off and {"reset": true}
+    clears the histograms.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if 'enabled' in data:
+            stage_timer.enabled = bool(data['enabled'])
+        if data.get('reset'):
+            stage_timer.reset()
+    return jsonify(stage_timer.summary())
+
+def _is_local_request():
+    """True for requests made from this host, whether or not a proxy header is present."""
+    direct_addr = request.environ.get('werkzeug.proxy_fix.orig', {}).get('REMOTE_ADDR', request.remote_addr)
+    return all(addr in ('127.0.0.1', '::1') for addr in (direct_addr, request.remote_addr))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose metrics aggregated across worker processes, to admins and local scrapers only."""
+    if not _is_local_request() and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/feedback', methods=['POST'])
+@rate_limiter.limit('feedback', _client_key)
 def submit_feedback():
     """Handle feedback submission for chat responses."""
     try:
@@ -231,8 +837,7 @@ def submit_feedback():
             return jsonify({'error': 'Rating must be a number'}), 400
         
         # Get the chat query
-        from models import ChatQuery
-        query = ChatQuery.query.get(query_id)
+        query = _find_chat_query(query_id)
         
         if not query:
             return jsonify({'error': 'Chat query not found'}), 404
@@ -245,6 +850,7 @@ def submit_feedback():
         
         # Save to database
         db.session.commit()
+        feedback_submissions_total.inc(rating=rating)
         
         return jsonify({'success': True, 'message': 'Feedback submitted successfully'})
         
@@ -252,39 +858,90 @@ def submit_feedback():
         logger.exception("Error submitting feedback")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    """Process chat messages and return responses."""
-    try:
-        data = request.json
-        user_message = data.get('message', '')
+SYSTEM_PROMPT = (
+    "You are a helpful assistant specializing in Brazilian housing laws, tenant rights, "
+    "and rental obligations. Provide accurate, concise information based on current Brazilian "
+    "legal frameworks. Always provide references to relevant laws when possible. "
+    "If you're unsure about something, admit it rather than providing incorrect information. "
+    "Remember that your responses should not be considered professional legal advice."
+)
+
+def _chat_request_error(data):
+    """
+    Check the body of a chat request before any state is created for it.
+
+    Returns:
+        An error message for the client, or None when the request is valid
+    """
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+    message = data.get('message', '')
+    if not isinstance(message, str) or not message.strip():
+        return 'No message provided'
+    conversation_id = data.get('conversation_id')
+    if conversation_id is not None and not isinstance(conversation_id, str):
+        return 'conversation_id must be a string'
+    history = data.get('history', [])
+    if not isinstance(history, list) or not all(isinstance(entry, str) for entry in history):
+        return 'history must be a list of strings'
+    return None
+
+def _resolve_conversation(data):
+    """
+    Return the conversation ID and recent history for a validated chat request.
+
+    Conversations live in this worker's ConversationStore, so one started on
+    another worker is not found and a new one is created in its place.
+    """
+    # Recent turns come from the conversation store; clients that still
+    # post their full history get a fresh conversation seeded from it
+    conversation_id = data.get('conversation_id')
+    chat_history = conversations.get_history(conversation_id) if conversation_id else None
+    if chat_history is None:
+        conversation_id = conversations.create()
         chat_history = data.get('history', [])
-        
-        # Get user_id from current_user if logged in
-        user_id = None
-        if current_user.is_authenticated:
-            user_id = current_user.id
-        
-        if not user_message:
-            return jsonify({'error': 'No message provided'}), 400
-        
-        # Preprocess the query
+        # Legacy clients include the current message as the last entry
+        if len(chat_history) % 2 == 1:
+            chat_history = chat_history[:-1]
+        chat_history = chat_history[-conversations.max_messages:]
+        for i in range(0, len(chat_history), 2):
+            conversations.append(conversation_id, chat_history[i], chat_history[i + 1])
+    return conversation_id, chat_history
+
+def _answer_message(user_message, chat_history):
+    """
+    Produce the answer for a chat message, using the response cache.
+
+    On a miss, identical requests already computing the same answer in this
+    worker are waited on rather than repeated.
+
+    Returns:
+        A (processed_query, assistant_message, citations, route) tuple, where
+        route describes which backend answered and why
+    """
+    with stage_timer.stage("cache_lookup"):
+        cache_key = make_cache_key(user_message, chat_history, app.config["CHAT_CACHE_HISTORY_TURNS"],
+                                   knowledge_state.current().version)
+        cached = response_cache.get(cache_key)
+    chat_cache_lookups_total.inc(result='miss' if cached is None else 'hit')
+    if cached is not None:
+        return cached
+    
+    answer, shared = chat_flights.do(cache_key, lambda: _compute_answer(user_message, chat_history, cache_key))
+    if shared:
+        chat_coalesced_requests_total.inc()
+    return answer
+
+def _compute_answer(user_message, chat_history, cache_key):
+    """Answer a chat message that missed the response cache and cache the result."""
+    # Preprocess the query
+    with stage_timer.stage("preprocess"):
         processed_query = preprocess_query(user_message)
-        logger.debug(f"Processed query: {processed_query}")
-        
+    logger.debug("Processed query: %s", processed_query)
+    
+    with stage_timer.stage("assemble_messages"):
         # Build the message history for the knowledge base
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful assistant specializing in Brazilian housing laws, tenant rights, "
-                    "and rental obligations. Provide accurate, concise information based on current Brazilian "
-                    "legal frameworks. Always provide references to relevant laws when possible. "
-                    "If you're unsure about something, admit it rather than providing incorrect information. "
-                    "Remember that your responses should not be considered professional legal advice."
-                )
-            }
-        ]
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
         
         # Add chat history (maintaining alternating user/assistant pattern)
         for i, msg in enumerate(chat_history):
@@ -293,38 +950,326 @@ def chat():
             
         # Add the current user query
         messages.append({"role": "user", "content": processed_query})
+    
+    with stage_timer.stage("route"):
+        decision = _route_message(user_message)
+    
+    # Get response from knowledge base or the remote backend
+    with stage_timer.stage("chat_response"):
+        response_data = get_chat_response(messages, allow_remote=decision.backend == REMOTE)
+    
+    # Extract the assistant's message and citations
+    assistant_message = response_data.get('choices', [{}])[0].get('message', {}).get('content', '')
+    citations = response_data.get('citations', [])
+    
+    if response_data.get('fallback'):
+        decision = decision._replace(backend=LOCAL, reason='remote backend failed')
+    chat_route_decisions_total.inc(backend=decision.backend)
+    route = decision.to_dict()
+    
+    # Error responses carry no citations and are not cached, nor are local
+    # fallbacks, so the remote answer is used once the backend recovers
+    if citations and not response_data.get('fallback'):
+        response_cache.put(cache_key, (processed_query, assistant_message, citations, route))
+    
+    return processed_query, assistant_message, citations, route
+
+def _route_message(user_message):
+    """Choose the backend for a message; everything is local without a remote backend."""
+    if not remote_backend_stats()['enabled']:
+        return RouteDecision(LOCAL, 0.0, None, 'no remote backend')
+    if not app.config["ROUTER_ENABLED"]:
+        return RouteDecision(REMOTE, 0.0, None, 'routing disabled')
+    return router.route(user_message)
+
+@stage_timer.timed("store")
+def _store_chat_query(user_id, processed_query, assistant_message):
+    """
+    Store a chat exchange for analytics and feedback.
+
+    Returns:
+        The ID the client should send back with feedback
+    """
+    if app.config["CHAT_WRITE_BEHIND"]:
+        # Queue the record; its public id is known before it is written
+        query_id = uuid.uuid4().hex
+        chat_writer.submit({
+            'public_id': query_id,
+            'user_id': user_id,  # This will be None for anonymous users
+            'query_text': processed_query,
+            'response_text': assistant_message,
+            'timestamp': datetime.utcnow(),
+        })
+        logger.debug("Queued chat query with public ID: %s", query_id)
+        return query_id
+    
+    from models import ChatQuery
+    
+    # Create a new ChatQuery
+    chat_query = ChatQuery(
+        user_id=user_id,  # This will be None for anonymous users
+        query_text=processed_query,
+        response_text=assistant_message
+    )
+    
+    # Add to the database
+    db.session.add(chat_query)
+    record_chat_queries(db.session, [user_id])
+    db.session.commit()
+    logger.debug("Stored chat query with ID: %s", chat_query.id)
+    return chat_query.id
+
+@app.route('/api/chat', methods=['POST'])
+@rate_limiter.limit('chat', _client_key)
+@chat_concurrency.limit
+def chat():
+    """Process chat messages and return responses."""
+    try:
+        data = request.get_json(silent=True)
+        error = _chat_request_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+        user_message = data['message']
+        conversation_id, chat_history = _resolve_conversation(data)
         
-        # Get response from knowledge base
-        response_data = get_chat_response(messages)
+        # Get user_id from current_user if logged in
+        user_id = None
+        if current_user.is_authenticated:
+            user_id = current_user.id
         
-        # Extract the assistant's message and citations
-        assistant_message = response_data.get('choices', [{}])[0].get('message', {}).get('content', '')
-        citations = response_data.get('citations', [])
+        processed_query, assistant_message, citations, route = _answer_message(user_message, chat_history)
         
         # Store the query in the database for analytics
-        from models import ChatQuery
-        
-        # Create a new ChatQuery
-        chat_query = ChatQuery(
-            user_id=user_id,  # This will be None for anonymous users
-            query_text=processed_query,
-            response_text=assistant_message
-        )
+        query_id = _store_chat_query(user_id, processed_query, assistant_message)
         
-        # Add to the database
-        db.session.add(chat_query)
-        db.session.commit()
-        logger.info(f"Stored chat query with ID: {chat_query.id}")
+        conversations.append(conversation_id, user_message, assistant_message)
         
         return jsonify({
             'response': assistant_message,
             'citations': citations,
-            'query_id': chat_query.id  # Include the query ID for feedback
+            'query_id': query_id,  # Include the query ID for feedback
+            'conversation_id': conversation_id,
+            'route': route
         })
         
     except Exception as e:
         logger.exception("Error processing chat request")
         return jsonify({'error': str(e)}), 500
 
+def _sse_event(event, payload):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def _iter_passages(text):
+    """Yield an answer paragraph by paragraph, keeping the separators."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n\n", start)
+        end = len(text) if end == -1 else end + 2
+        yield text[start:end]
+        start = end
+
+@app.route('/api/chat/stream', methods=['POST'])
+@rate_limiter.limit('chat', _client_key)
+@chat_concurrency.limit
+def chat_stream():
+    """
+    Stream a chat response as Server-Sent Events.
+
+    Emits a ``conversation`` event, one ``passage`` event per paragraph of the
+    answer, a ``citations`` event and finally a ``done`` event carrying the
+    query ID for feedback and the routing decision. Failures after the stream has started are reported
+    as an ``error`` event.
+
+    The answer is produced whole (from the response cache, the local
+    knowledge base or one non-streaming remote call) and only then split into
+    passages, so the first passage arrives when the full answer is ready. The
+    stream lets the client render the answer progressively and learn the
+    conversation ID early; it does not shorten the time to the first passage.
+    """
+    data = request.get_json(silent=True)
+    error = _chat_request_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    user_message = data['message']
+    
+    user_id = current_user.id if current_user.is_authenticated else None
+    
+    def generate():
+        try:
+            conversation_id, chat_history = _resolve_conversation(data)
+            yield _sse_event('conversation', {'conversation_id': conversation_id})
+            
+            processed_query, assistant_message, citations, route = _answer_message(user_message, chat_history)
+            for passage in _iter_passages(assistant_message):
+                yield _sse_event('passage', {'text': passage})
+            yield _sse_event('citations', {'citations': citations})
+            
+            query_id = _store_chat_query(user_id, processed_query, assistant_message)
+            conversations.append(conversation_id, user_message, assistant_message)
+            yield _sse_event('done', {'query_id': query_id, 'conversation_id': conversation_id, 'route': route})
+        except Exception as e:
+            logger.exception("Error streaming chat response")
+            yield _sse_event('error', {'error': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _persist_chat_queries(rows):
+    """Store a batch of chat exchanges with one bulk insert, or queue them in write-behind mode."""
+    if app.config["CHAT_WRITE_BEHIND"]:
+        for row in rows:
+            chat_writer.submit(row)
+    else:
+        _insert_chat_queries(rows)
+
+def _batch_client():
+    """
+    Identify the caller of /api/chat/batch.
+
+    Returns:
+        A (limit name, rate limit key) tuple, or None when the request is
+        neither from a logged-in user nor signed with a partner key
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        for partner_key in app.config["CHAT_BATCH_API_KEYS"]:
+            if hmac.compare_digest(api_key.encode(), partner_key.encode()):
+                return 'chat_partner', "partner:" + hashlib.sha256(partner_key.encode()).hexdigest()[:16]
+        return None
+    if current_user.is_authenticated:
+        return 'chat', _client_key()
+    return None
+
+def _batch_question_count(messages):
+    """Number of distinct questions in a batch that will be answered, which is what it is charged."""
+    max_length = app.config["CHAT_BATCH_MAX_MESSAGE_LENGTH"]
+    return len({
+        normalize_query(message) for message in messages
+        if isinstance(message, str) and message.strip() and len(message) <= max_length
+    })
+
+def _batch_results(messages, user_id, chunk_size):
+    """
+    Answer and store a batch of chat messages, yielding one result per message in order.
+
+    Each distinct normalized question is answered once however often it
+    appears. Messages are handled ``chunk_size`` at a time, and the exchanges
+    of a chunk are stored with one insert before its results are yielded, so
+    every query ID handed out can be used for feedback.
+    """
+    max_length = app.config["CHAT_BATCH_MAX_MESSAGE_LENGTH"]
+    answers = {}
+    
+    for start in range(0, len(messages), chunk_size):
+        results, rows = [], []
+        for index, message in enumerate(messages[start:start + chunk_size], start):
+            if not isinstance(message, str) or not message.strip():
+                results.append({'index': index, 'error': 'No message provided'})
+                continue
+            if len(message) > max_length:
+                results.append({'index': index, 'error': f'Message is longer than {max_length} characters'})
+                continue
+            
+            key = normalize_query(message)
+            if key not in answers:
+                try:
+                    answers[key] = _answer_message(message, [])
+                except Exception as e:
+                    logger.exception("Error answering batch message %d", index)
+                    answers[key] = e
+            answer = answers[key]
+            if isinstance(answer, Exception):
+                results.append({'index': index, 'error': str(answer)})
+                continue
+            
+            processed_query, assistant_message, citations, route = answer
+            query_id = uuid.uuid4().hex
+            rows.append({
+                'public_id': query_id,
+                'user_id': user_id,
+                'query_text': processed_query,
+                'response_text': assistant_message,
+                'timestamp': datetime.utcnow(),
+            })
+            results.append({
+                'index': index,
+                'response': assistant_message,
+                'citations': citations,
+                'query_id': query_id,
+                'route': route,
+            })
+        
+        if rows:
+            _persist_chat_queries(rows)
+        yield from results
+
+@app.route('/api/chat/batch', methods=['POST'])
+@chat_concurrency.limit
+def chat_batch():
+    """
+    Answer many independent chat messages in one request.
+
+    The body is ``{"messages": [...], "stream": false}``. Results come back in
+    the order of the messages, each with either the answer fields of /api/chat
+    or an ``error``; one failing message does not fail the others. With
+    ``"stream": true`` the results are sent as newline-delimited JSON while
+    the batch is processed, which allows larger batches.
+
+    Callers must be logged in or send a partner key in ``X-API-Key``. Every
+    distinct question costs one token of the caller's rate limit (the chat
+    limit for users, the partner limit for partners) and the whole batch is
+    charged before any answer is computed, so a batch can reach the remote
+    backend no more often than the same questions sent to /api/chat.
+    """
+    client = _batch_client()
+    if client is None:
+        return jsonify({'error': 'Log in or send a partner key in X-API-Key to use batch chat'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'messages must be a non-empty list'}), 400
+    
+    stream = bool(data.get('stream'))
+    max_items = app.config["CHAT_BATCH_MAX_STREAM_ITEMS" if stream else "CHAT_BATCH_MAX_ITEMS"]
+    if len(messages) > max_items:
+        return jsonify({'error': f'At most {max_items} messages per batch'}), 413
+    
+    limit_name, client_key = client
+    cost = _batch_question_count(messages)
+    burst = rate_limiter.limits[limit_name].burst
+    if rate_limiter.enabled and cost > burst:
+        return jsonify({'error': f'At most {int(burst)} distinct questions per batch'}), 413
+    rate_limiter.enforce(limit_name, client_key, cost)
+    
+    user_id = current_user.id if current_user.is_authenticated else None
+    
+    if not stream:
+        try:
+            results = list(_batch_results(messages, user_id, len(messages)))
+        except Exception as e:
+            logger.exception("Error processing chat batch")
+            return jsonify({'error': str(e)}), 500
+        return jsonify({'results': results})
+    
+    def generate():
+        try:
+            for result in _batch_results(messages, user_id, app.config["CHAT_BATCH_CHUNK_SIZE"]):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.exception("Error streaming chat batch")
+            yield json.dumps({'error': str(e)}, ensure_ascii=False) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Run after every hot query above has been registered
+if app.config["CHECK_QUERY_PLANS"]:
+    with app.app_context():
+        check_query_plans(db.session)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,73 @@
+"""
+Cost of building a topic answer on every request versus looking it up.
+
+Compares calling each topic renderer on its knowledge base section, as
+get_relevant_info used to do per request, against reading the answer rendered
+once when the knowledge base state was loaded, and checks that both give the
+same text. Sections padded with synthetic list items show how the per-request
+cost grows with the size of a topic.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_answers
+"""
+import copy
+import time
+
+from utils.answers import TOPIC_RENDERERS, render_topic_answers
+from utils.knowledge_state import current
+
+LIST_SIZES = [0, 100, 1_000]
+ITERATIONS = 20_000
+
+# The list of each topic that grows in the padded knowledge bases
+PADDED_LISTS = {
+    "tenant_rights": ["basic_rights"],
+    "landlord_obligations": ["main_duties"],
+    "rental_contracts": ["required_documents", "for_tenants"],
+    "eviction_process": ["procedure", "steps"],
+}
+
+
+def padded_knowledge_base(knowledge_base: dict, extra_items: int) -> dict:
+    """Copy the knowledge base with ``extra_items`` added to one list per topic."""
+    padded = copy.deepcopy(knowledge_base)
+    for topic, path in PADDED_LISTS.items():
+        node = padded.get(topic, {})
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        items = node.setdefault(path[-1], [])
+        items.extend(f"Synthetic provision {i} of the {topic.replace('_', ' ')} section" for i in range(extra_items))
+    return padded
+
+
+def measure(func, iterations: int) -> float:
+    """Return the mean time of ``func`` in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    print(f"{'extra items':>11} {'topic':>22} {'render us':>10} {'lookup us':>10} {'speedup':>8}")
+    base = current().knowledge_base
+
+    for extra in LIST_SIZES:
+        knowledge_base = padded_knowledge_base(base, extra)
+        answers = render_topic_answers(knowledge_base)
+        iterations = max(ITERATIONS // (extra + 1), 200)
+
+        for topic, render in TOPIC_RENDERERS.items():
+            if topic not in knowledge_base:
+                continue
+            section = knowledge_base[topic]
+            assert render(section) == answers[topic], f"pre-rendered answer for {topic} differs"
+
+            rendered = measure(lambda: render(section), iterations)
+            looked_up = measure(lambda: answers.get(topic), iterations)
+            print(f"{extra:>11} {topic:>22} {rendered:>10.2f} {looked_up:>10.3f} {rendered / looked_up:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
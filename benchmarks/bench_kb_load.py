@@ -0,0 +1,69 @@
+"""
+Knowledge base load time from the JSON file versus from a compiled snapshot.
+
+The real knowledge base is measured first, then synthetic ones padded with
+extra articles sampled from its vocabulary, so the gap can be seen at the
+sizes a larger legal corpus would reach. Each figure is the best of a few
+loads of the full state: parsed JSON, retrieval index, vocabulary matcher and
+rendered topic answers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_kb_load
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+from utils.knowledge_state import KNOWLEDGE_BASE_PATH, build_snapshot, load_knowledge_base, load_state
+
+EXTRA_ARTICLES = [0, 10_000, 100_000]
+REPEATS = 3
+
+
+def write_knowledge_base(directory: str, extra_articles: int, seed: int = 42) -> str:
+    """Write the real knowledge base plus ``extra_articles`` synthetic ones and return its path."""
+    knowledge_base = load_knowledge_base()
+    if extra_articles:
+        rng = random.Random(seed)
+        words = sorted({word for section in knowledge_base.values() for word in json.dumps(section).split()})
+        knowledge_base["synthetic_articles"] = [
+            " ".join(rng.choices(words, k=rng.randint(8, 40))) for _ in range(extra_articles)
+        ]
+    path = os.path.join(directory, f"kb_{extra_articles}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(knowledge_base, f, ensure_ascii=False)
+    return path
+
+
+def best_load_ms(json_path: str, snapshot_path: str) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        load_state(json_path, snapshot_path)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main() -> None:
+    print(f"{'articles':>10} {'json MB':>8} {'snap MB':>8} {'json ms':>9} {'snap ms':>9} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for extra in EXTRA_ARTICLES:
+            json_path = KNOWLEDGE_BASE_PATH if extra == 0 else write_knowledge_base(directory, extra)
+            snapshot_path = os.path.join(directory, f"kb_{extra}.kbsnap")
+            missing_snapshot = os.path.join(directory, "missing.kbsnap")
+
+            json_ms = best_load_ms(json_path, missing_snapshot)
+            build_snapshot(json_path, snapshot_path)
+            snapshot_ms = best_load_ms(json_path, snapshot_path)
+
+            print(f"{extra:>10} {os.path.getsize(json_path) / 1e6:>8.2f} "
+                  f"{os.path.getsize(snapshot_path) / 1e6:>8.2f} {json_ms:>9.1f} "
+                  f"{snapshot_ms:>9.1f} {json_ms / snapshot_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
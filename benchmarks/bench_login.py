@@ -0,0 +1,65 @@
+"""
+Login throughput, in successful logins per second per core.
+
+Posts to /login through the Flask test client from several threads against a
+throwaway SQLite database, so the numbers cover form handling, the user
+lookup, password verification on the hashing pool and the session cookie.
+Each row sizes the hashing pool to the number of cores it is allowed to use.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_login
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_login.db")
+os.environ.setdefault("SESSION_SECRET", "benchmark")
+os.environ.setdefault("STATS_RECONCILE_INTERVAL", "0")
+
+from app import app, password_hasher  # noqa: E402
+
+USERNAME = "benchuser"
+PASSWORD = "benchmark-password"
+LOGINS_PER_THREAD = 10
+CLIENT_THREADS = 8
+
+
+def login_worker(count: int) -> int:
+    client = app.test_client()
+    succeeded = 0
+    for _ in range(count):
+        response = client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+        succeeded += response.status_code == 302
+        client.get("/logout")
+    return succeeded
+
+
+def measure(cores: int) -> float:
+    """Return logins per second with the hashing pool limited to ``cores`` threads."""
+    password_hasher.max_workers = cores
+    password_hasher._pool.reset()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENT_THREADS) as pool:
+        succeeded = sum(pool.map(login_worker, [LOGINS_PER_THREAD] * CLIENT_THREADS))
+    elapsed = time.perf_counter() - start
+    assert succeeded == LOGINS_PER_THREAD * CLIENT_THREADS, f"only {succeeded} logins succeeded"
+    return succeeded / elapsed
+
+
+def main() -> None:
+    client = app.test_client()
+    client.post("/register", data={"username": USERNAME, "email": "bench@example.com", "password": PASSWORD})
+
+    print(f"password hash method: {password_hasher.method}")
+    print(f"{'cores':>6} {'logins/s':>10} {'per core':>10}")
+    for cores in sorted({1, os.cpu_count() or 1}):
+        rate = measure(cores)
+        print(f"{cores:>6} {rate:>10.1f} {rate / cores:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Throughput of query term normalization on long pasted contract clauses.
+
+Compares the per-mapping ``re.sub`` loop that preprocess_query used to run
+(one full pass over the query per mapping) against the single precompiled
+alternation in ``normalize_terms``, and checks that both give the same output.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_preprocess
+"""
+import re
+import time
+
+from utils.nlp_processor import ACRONYM_MAPPINGS, TERM_MAPPINGS, normalize_terms
+
+CLAUSE = (
+    "Cláusula 5ª - O LOCATÁRIO declara ter vistoriado o apartamento e o recebe em perfeito estado. "
+    "The tenant (renter) shall pay the rent plus IPTU and condomínio fees by the 5th day of each month; "
+    "the landlord (proprietário) may adjust the rent annually by the IGPM or, failing that, the IPCA. "
+    "A deposit (caução) equal to three months of rent is due on signature of this contract (contrato), "
+    "and the guarantor (garantidor) answers jointly for any debt of the inquilino until the keys of the "
+    "house, flat or apt are returned to the dono. "
+)
+QUERY_SIZES = [1, 10, 50]
+ITERATIONS = 2_000
+
+
+def legacy_normalize(text: str) -> str:
+    """The original implementation: one regex pass per mapping."""
+    for term, replacement in TERM_MAPPINGS.items():
+        text = re.sub(r'\b' + term + r'\b', replacement, text)
+    for acronym, expansion in ACRONYM_MAPPINGS.items():
+        text = re.sub(r'\b' + acronym + r'\b', expansion, text)
+    return text
+
+
+def measure(func, text: str, iterations: int) -> float:
+    """Return the throughput of ``func`` in queries per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(text)
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    print(f"{'clauses':>8} {'chars':>8} {'legacy q/s':>12} {'single q/s':>12} {'speedup':>8}")
+    for clauses in QUERY_SIZES:
+        text = (CLAUSE * clauses).lower()
+        assert legacy_normalize(text) == normalize_terms(text), "normalizer output differs from legacy"
+
+        iterations = max(ITERATIONS // clauses, 20)
+        legacy = measure(legacy_normalize, text, iterations)
+        single = measure(normalize_terms, text, iterations)
+        print(f"{clauses:>8} {len(text):>8} {legacy:>12.0f} {single:>12.0f} {single / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
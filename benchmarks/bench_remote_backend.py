@@ -0,0 +1,83 @@
+"""
+Latency of the remote answer backend client against a local stub server.
+
+Compares a new connection per request (plain ``requests.post``) against the
+pooled keep-alive session of RemoteChatBackend, then shows what callers see
+while the backend fails: retries with backoff until the circuit opens, after
+which get_chat_response falls back to the local knowledge base immediately.
+The stub speaks plain HTTP on loopback and stands in for the TLS handshake
+and extra round trips of a new connection to the real API with a fixed delay
+per connection (HANDSHAKE_MS).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_remote_backend
+"""
+import statistics
+import time
+
+import requests
+
+from benchmarks.stub_backend import start_stub_server
+from utils.perplexity_client import CircuitBreaker, RemoteChatBackend, configure_remote_backend, get_chat_response
+
+NUM_REQUESTS = 200
+HANDSHAKE_MS = 30
+MESSAGES = [{"role": "user", "content": "can my landlord raise the rent every six months?"}]
+
+
+def summarize(label: str, timings: list) -> None:
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"{label:>28} {statistics.mean(timings):>9.3f} {p95:>9.3f}")
+
+
+def bench_connections() -> None:
+    server, _ = start_stub_server(handshake_latency=HANDSHAKE_MS / 1000)
+    print(f"{'client':>28} {'mean ms':>9} {'p95 ms':>9}")
+
+    timings = []
+    for _ in range(NUM_REQUESTS):
+        start = time.perf_counter()
+        requests.post(server.url, json={"messages": MESSAGES}, timeout=(2, 5)).json()
+        timings.append((time.perf_counter() - start) * 1000)
+    summarize("new connection per request", timings)
+    fresh_connections = server.connections
+
+    backend = RemoteChatBackend(url=server.url)
+    timings = []
+    for _ in range(NUM_REQUESTS):
+        start = time.perf_counter()
+        backend.complete(MESSAGES)
+        timings.append((time.perf_counter() - start) * 1000)
+    summarize("pooled keep-alive session", timings)
+
+    print(f"TCP connections opened: {fresh_connections} without pooling, "
+          f"{server.connections - fresh_connections} with pooling")
+    server.shutdown()
+
+
+def bench_failover() -> None:
+    server, _ = start_stub_server(failure_rate=1.0)
+    backend = RemoteChatBackend(url=server.url, max_retries=2, backoff_base=0.05,
+                                breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    configure_remote_backend(backend)
+
+    print(f"\n{'call':>5} {'ms':>8} {'fallback':>9} {'circuit':>10}")
+    for call in range(1, 7):
+        start = time.perf_counter()
+        response = get_chat_response(MESSAGES)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{call:>5} {elapsed:>8.1f} {str(response.get('fallback', False)):>9} {backend.breaker.state:>10}")
+
+    print(f"Requests that reached the stub: {server.requests}; client stats: {backend.stats()}")
+    configure_remote_backend(None)
+    server.shutdown()
+
+
+def main() -> None:
+    bench_connections()
+    bench_failover()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Per-query latency of BM25 retrieval at growing knowledge base sizes.
+
+Synthetic passages are sampled from the vocabulary of the real knowledge base
+with a Zipf-like word distribution, so posting-list lengths grow with the corpus
+the way they would for a larger collection of legal articles.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_retrieval
+"""
+import random
+import statistics
+import time
+
+from utils.knowledge_state import load_knowledge_base
+from utils.nlp_processor import preprocess_query
+from utils.retrieval import Passage, RetrievalIndex, flatten_knowledge_base
+
+CORPUS_SIZES = [1_000, 10_000, 100_000]
+NUM_QUERIES = 200
+QUERIES = [
+    "can my landlord raise rent",
+    "how much deposit can the landlord ask",
+    "my landlord wants to evict me without a court order",
+    "what documents do I need for a rental contract",
+    "who pays for repairs in the apartment",
+    "lei 8245 reajuste do aluguel pelo IGPM",
+]
+
+
+def build_corpus(size: int, seed: int = 42) -> list:
+    """Generate ``size`` synthetic passages from the knowledge base vocabulary."""
+    rng = random.Random(seed)
+    words = []
+    for passage in flatten_knowledge_base(load_knowledge_base()):
+        words.extend(passage.text.split())
+    vocabulary = sorted(set(words))
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    rng.shuffle(vocabulary)
+
+    topics = ["tenant_rights", "landlord_obligations", "rental_contracts", "eviction_process", "common_disputes"]
+    passages = []
+    for i in range(size):
+        topic = topics[i % len(topics)]
+        text = " ".join(rng.choices(vocabulary, weights=weights, k=rng.randint(8, 40)))
+        passages.append(Passage(i, topic, f"{topic}.synthetic", text))
+    return passages
+
+
+def main() -> None:
+    queries = [preprocess_query(q) for q in QUERIES]
+    print(f"{'passages':>10} {'terms':>8} {'build s':>8} {'mean ms':>8} {'p95 ms':>8}")
+
+    for size in CORPUS_SIZES:
+        passages = build_corpus(size)
+        start = time.perf_counter()
+        index = RetrievalIndex(passages)
+        build_seconds = time.perf_counter() - start
+
+        timings = []
+        for i in range(NUM_QUERIES):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            index.search(query, top_k=10)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"{size:>10} {len(index.vocabulary):>8} {build_seconds:>8.2f} {statistics.mean(timings):>8.3f} {p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local stand-in for the remote chat completions backend.
+
+Answers POSTs in the shape of Perplexity's chat completions API after a
+configurable delay, and can be told to fail a fraction of requests, so the
+remote mode of perplexity_client can be exercised without network access.
+Keep-alive is supported, and each new connection can be delayed to stand in
+for the TLS handshake and network round trips of the real service.
+
+Run from the repository root, then start the app with
+ANSWER_BACKEND=remote REMOTE_BACKEND_URL=http://127.0.0.1:8099/chat/completions:
+
+    python -m benchmarks.stub_backend --port 8099 --latency-ms 200
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubBackendServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 503,
+                 handshake_latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        # When set, sent as the body of every successful response instead of an answer
+        self.response_body = None
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs
+    # stall every response on a reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        time.sleep(self.server.handshake_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        server.requests += 1
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(server.latency)
+
+        if random.random() < server.failure_rate:
+            self._send(server.failure_status, {"error": "stub failure"})
+            return
+
+        if server.response_body is not None:
+            self._send(200, server.response_body)
+            return
+
+        question = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        self._send(200, {
+            "choices": [{"message": {"role": "assistant", "content": f"Stub answer to: {question[:80]}"}}],
+            "citations": ["http://www.planalto.gov.br/ccivil_03/leis/l8245.htm"],
+        })
+
+    def _send(self, status: int, payload) -> None:
+        encoded = json.dumps(payload).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and hung up, as it is meant to
+            self.close_connection = True
+
+
+def start_stub_server(latency: float = 0.0, failure_rate: float = 0.0, handshake_latency: float = 0.0,
+                      port: int = 0) -> Tuple[StubBackendServer, threading.Thread]:
+    """Start a stub server on a background thread; call ``shutdown()`` on it when done."""
+    server = StubBackendServer(("127.0.0.1", port), latency=latency, failure_rate=failure_rate,
+                               handshake_latency=handshake_latency)
+    thread = threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--handshake-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubBackendServer(("127.0.0.1", args.port), latency=args.latency_ms / 1000,
+                               failure_rate=args.failure_rate, handshake_latency=args.handshake_ms / 1000)
+    print(f"Stub backend listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from app import db
 from flask_login import UserMixin
 from datetime import datetime
+import uuid
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,7 +14,17 @@ class User(UserMixin, db.Model):
 
 class ChatQuery(db.Model):
     """Model to store chat queries for analytics and improvement."""
+    __table_args__ = (
+        # Per-user history, newest first, paginated on (timestamp, id)
+        db.Index('ix_chat_query_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+        # Recent queries across all users
+        db.Index('ix_chat_query_timestamp', 'timestamp', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
+    # Client-facing identifier, assigned before the row is written so that it
+    # can be returned for feedback while the insert is still queued
+    public_id = db.Column(db.String(32), unique=True, index=True, default=lambda: uuid.uuid4().hex)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     query_text = db.Column(db.Text, nullable=False)
     response_text = db.Column(db.Text, nullable=False)
@@ -24,3 +35,15 @@ class ChatQuery(db.Model):
     feedback_rating = db.Column(db.Integer, nullable=True)  # Rating 1-5
     feedback_comments = db.Column(db.Text, nullable=True)  # Optional user comments
     feedback_timestamp = db.Column(db.DateTime, nullable=True)  # When feedback was given
+
+class StatCounter(db.Model):
+    """Running totals kept up to date as records are written, for constant-time dashboards."""
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserQueryCount(db.Model):
+    """Per-user chat query totals, maintained alongside ChatQuery inserts."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    query_count = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    user = db.relationship('User')
@@ -4,8 +4,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const chatMessages = document.getElementById('chat-messages');
     const typingIndicator = document.getElementById('typing-indicator');
     
-    // Store chat history
-    let chatHistory = [];
+    // The server keeps the conversation history; we only track its ID
+    let conversationId = null;
     
     // Display initial bot message
     displayBotMessage(
@@ -24,9 +24,6 @@ document.addEventListener('DOMContentLoaded', function() {
             // Display user message
             displayUserMessage(message);
             
-            // Add to chat history
-            chatHistory.push(message);
-            
             // Clear input
             userInput.value = '';
             
@@ -50,105 +47,121 @@ document.addEventListener('DOMContentLoaded', function() {
         scrollToBottom();
     }
     
-    function displayBotMessage(message, citations, queryId) {
+    function createBotMessage() {
         const messageElement = document.createElement('div');
         messageElement.classList.add('message', 'bot-message');
-        
-        // Process message text (convert line breaks and format citations)
-        const formattedMessage = formatMessage(message);
-        
-        let citationsHtml = '';
-        if (citations && citations.length > 0) {
-            citationsHtml = `
-                <div class="citations">
-                    <h6>References:</h6>
-                    <ul>
-                        ${citations.map(citation => `<li><a href="${citation}" target="_blank">${citation}</a></li>`).join('')}
-                    </ul>
-                </div>
-            `;
-        }
-        
-        // Create feedback component if query ID exists
-        let feedbackHtml = '';
-        if (queryId) {
-            feedbackHtml = `
-                <div class="feedback-component mt-2" data-query-id="${queryId}">
-                    <div class="feedback-question mb-1">Was this response helpful?</div>
-                    <div class="feedback-stars">
-                        <span class="star" data-rating="1"><i class="far fa-star"></i></span>
-                        <span class="star" data-rating="2"><i class="far fa-star"></i></span>
-                        <span class="star" data-rating="3"><i class="far fa-star"></i></span>
-                        <span class="star" data-rating="4"><i class="far fa-star"></i></span>
-                        <span class="star" data-rating="5"><i class="far fa-star"></i></span>
-                    </div>
-                    <div class="feedback-comments mt-2 d-none">
-                        <textarea class="form-control form-control-sm" placeholder="Any additional comments? (optional)"></textarea>
-                        <button class="btn btn-sm btn-primary mt-1 submit-feedback">Submit</button>
-                    </div>
-                </div>
-            `;
-        }
-        
         messageElement.innerHTML = `
             <div class="message-content">
                 <div class="bot-icon">
                     <i class="fas fa-balance-scale"></i>
                 </div>
-                <div>
-                    ${formattedMessage}
-                    ${citationsHtml}
-                    ${feedbackHtml}
+                <div class="bot-message-body">
+                    <div class="bot-message-text"></div>
                 </div>
             </div>
         `;
-        
         chatMessages.appendChild(messageElement);
+        return messageElement;
+    }
+    
+    function appendBotText(messageElement, text) {
+        // Passages end on paragraph boundaries, so each one can be formatted on its own
+        messageElement.querySelector('.bot-message-text').insertAdjacentHTML('beforeend', formatMessage(text));
+        scrollToBottom();
+    }
+    
+    function renderCitations(messageElement, citations) {
+        if (!citations || citations.length === 0) {
+            return;
+        }
+        const citationsHtml = `
+            <div class="citations">
+                <h6>References:</h6>
+                <ul>
+                    ${citations.map(formatCitation).join('')}
+                </ul>
+            </div>
+        `;
+        messageElement.querySelector('.bot-message-body').insertAdjacentHTML('beforeend', citationsHtml);
+        scrollToBottom();
+    }
+    
+    function formatCitation(citation) {
+        const text = escapeHtml(String(citation));
+        // Only link web addresses; anything else (javascript: URLs included) is shown as text
+        if (!/^https?:\/\//i.test(citation)) {
+            return `<li>${text}</li>`;
+        }
+        return `<li><a href="${text}" target="_blank" rel="noopener noreferrer">${text}</a></li>`;
+    }
+    
+    function displayBotMessage(message, citations, queryId) {
+        const messageElement = createBotMessage();
+        appendBotText(messageElement, message);
+        renderCitations(messageElement, citations);
+        attachFeedback(messageElement, queryId);
+    }
+    
+    function attachFeedback(messageElement, queryId) {
+        // Create feedback component if query ID exists
+        if (!queryId) {
+            return;
+        }
+        
+        const feedbackHtml = `
+            <div class="feedback-component mt-2" data-query-id="${escapeHtml(String(queryId))}">
+                <div class="feedback-question mb-1">Was this response helpful?</div>
+                <div class="feedback-stars">
+                    <span class="star" data-rating="1"><i class="far fa-star"></i></span>
+                    <span class="star" data-rating="2"><i class="far fa-star"></i></span>
+                    <span class="star" data-rating="3"><i class="far fa-star"></i></span>
+                    <span class="star" data-rating="4"><i class="far fa-star"></i></span>
+                    <span class="star" data-rating="5"><i class="far fa-star"></i></span>
+                </div>
+                <div class="feedback-comments mt-2 d-none">
+                    <textarea class="form-control form-control-sm" placeholder="Any additional comments? (optional)"></textarea>
+                    <button class="btn btn-sm btn-primary mt-1 submit-feedback">Submit</button>
+                </div>
+            </div>
+        `;
+        messageElement.querySelector('.bot-message-body').insertAdjacentHTML('beforeend', feedbackHtml);
         
         // Add event listeners for feedback stars
-        if (queryId) {
-            const feedbackComponent = messageElement.querySelector('.feedback-component');
-            const stars = feedbackComponent.querySelectorAll('.star');
-            const commentsSection = feedbackComponent.querySelector('.feedback-comments');
+        const feedbackComponent = messageElement.querySelector('.feedback-component');
+        const stars = feedbackComponent.querySelectorAll('.star');
+        const commentsSection = feedbackComponent.querySelector('.feedback-comments');
+        
+        stars.forEach(star => {
+            star.addEventListener('mouseover', function() {
+                const rating = parseInt(this.getAttribute('data-rating'));
+                highlightStars(stars, rating);
+            });
             
-            stars.forEach(star => {
-                star.addEventListener('mouseover', function() {
-                    const rating = parseInt(this.getAttribute('data-rating'));
-                    highlightStars(stars, rating);
-                });
-                
-                star.addEventListener('mouseout', function() {
-                    const selectedRating = feedbackComponent.getAttribute('data-selected-rating');
-                    if (selectedRating) {
-                        highlightStars(stars, parseInt(selectedRating));
-                    } else {
-                        resetStars(stars);
-                    }
-                });
-                
-                star.addEventListener('click', function() {
-                    const rating = parseInt(this.getAttribute('data-rating'));
-                    feedbackComponent.setAttribute('data-selected-rating', rating);
-                    highlightStars(stars, rating);
-                    commentsSection.classList.remove('d-none');
-                });
+            star.addEventListener('mouseout', function() {
+                const selectedRating = feedbackComponent.getAttribute('data-selected-rating');
+                if (selectedRating) {
+                    highlightStars(stars, parseInt(selectedRating));
+                } else {
+                    resetStars(stars);
+                }
             });
             
-            // Submit feedback button
-            const submitButton = feedbackComponent.querySelector('.submit-feedback');
-            submitButton.addEventListener('click', function() {
-                const rating = feedbackComponent.getAttribute('data-selected-rating');
-                const comments = feedbackComponent.querySelector('textarea').value;
-                
-                submitFeedback(queryId, rating, comments, feedbackComponent);
+            star.addEventListener('click', function() {
+                const rating = parseInt(this.getAttribute('data-rating'));
+                feedbackComponent.setAttribute('data-selected-rating', rating);
+                highlightStars(stars, rating);
+                commentsSection.classList.remove('d-none');
             });
-        }
+        });
         
-        // Add to chat history
-        if (chatHistory.length % 2 === 1) {
-            // Only add bot message if it's responding to a user message
-            chatHistory.push(message);
-        }
+        // Submit feedback button
+        const submitButton = feedbackComponent.querySelector('.submit-feedback');
+        submitButton.addEventListener('click', function() {
+            const rating = feedbackComponent.getAttribute('data-selected-rating');
+            const comments = feedbackComponent.querySelector('textarea').value;
+            
+            submitFeedback(queryId, rating, comments, feedbackComponent);
+        });
         
         scrollToBottom();
     }
@@ -211,8 +224,12 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function formatMessage(text) {
+        // Answers can come from the remote backend and are cached across users,
+        // so treat them as untrusted text and only add markup of our own
+        let formatted = escapeHtml(String(text));
+        
         // Convert line breaks to <br> tags
-        let formatted = text.replace(/\n/g, '<br>');
+        formatted = formatted.replace(/\n/g, '<br>');
         
         // Format law citations (like "Lei nº 8.245/91" or "Art. 22")
         formatted = formatted.replace(/(Lei\s+nº\s+[\d\.]+\/\d+)/gi, '<strong>$1</strong>');
@@ -226,6 +243,104 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function sendMessageToServer(message) {
+        // Fall back to the JSON endpoint where streamed bodies are unsupported
+        if (!window.ReadableStream || !window.TextDecoder) {
+            sendMessageWithoutStreaming(message);
+            return;
+        }
+        
+        fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: message,
+                conversation_id: conversationId
+            })
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Network response was not ok');
+            }
+            return readEventStream(response.body.getReader());
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            typingIndicator.style.display = 'none';
+            displayBotMessage("Sorry, I'm having trouble connecting to my knowledge base. Please try again later.", [], null);
+        });
+    }
+    
+    function readEventStream(reader) {
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let messageElement = null;
+        
+        function handleEvent(name, payload) {
+            if (name === 'conversation') {
+                // The server starts a new conversation if ours has expired
+                conversationId = payload.conversation_id;
+                return;
+            }
+            
+            // Replace the typing indicator with the message as soon as content arrives
+            if (!messageElement) {
+                typingIndicator.style.display = 'none';
+                messageElement = createBotMessage();
+            }
+            
+            if (name === 'passage') {
+                appendBotText(messageElement, payload.text);
+            } else if (name === 'citations') {
+                renderCitations(messageElement, payload.citations);
+            } else if (name === 'done') {
+                attachFeedback(messageElement, payload.query_id);
+            } else if (name === 'error') {
+                appendBotText(messageElement, `Sorry, I encountered an error: ${payload.error}`);
+            }
+        }
+        
+        function processBuffer() {
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let name = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        name = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                });
+                if (data) {
+                    handleEvent(name, JSON.parse(data));
+                }
+                boundary = buffer.indexOf('\n\n');
+            }
+        }
+        
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    buffer += decoder.decode();
+                    processBuffer();
+                    typingIndicator.style.display = 'none';
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                processBuffer();
+                return pump();
+            });
+        }
+        
+        return pump();
+    }
+    
+    function sendMessageWithoutStreaming(message) {
         fetch('/api/chat', {
             method: 'POST',
             headers: {
@@ -233,7 +348,7 @@ document.addEventListener('DOMContentLoaded', function() {
             },
             body: JSON.stringify({
                 message: message,
-                history: chatHistory
+                conversation_id: conversationId
             })
         })
         .then(response => {
@@ -249,6 +364,8 @@ document.addEventListener('DOMContentLoaded', function() {
             if (data.error) {
                 displayBotMessage(`Sorry, I encountered an error: ${data.error}`, [], null);
             } else {
+                // The server starts a new conversation if ours has expired
+                conversationId = data.conversation_id;
                 displayBotMessage(data.response, data.citations, data.query_id);
             }
         })
@@ -0,0 +1,110 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const historyList = document.getElementById('chat-history-list');
+    const sentinel = document.getElementById('chat-history-sentinel');
+
+    if (!historyList || !sentinel) {
+        return;
+    }
+
+    let nextCursor = sentinel.getAttribute('data-next-cursor');
+    let loading = false;
+
+    // Load the next page whenever the sentinel below the list scrolls into view
+    const observer = new IntersectionObserver(function(entries) {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+
+    function loadNextPage() {
+        if (loading || !nextCursor) {
+            return;
+        }
+        loading = true;
+
+        fetch(`/api/profile/history?cursor=${encodeURIComponent(nextCursor)}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            data.items.forEach(item => historyList.insertAdjacentHTML('beforeend', renderQueryCard(item)));
+            nextCursor = data.next_cursor;
+            loading = false;
+
+            if (!nextCursor) {
+                observer.disconnect();
+                sentinel.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            loading = false;
+            sentinel.innerHTML = 'Could not load more conversations. Please reload the page.';
+            observer.disconnect();
+        });
+    }
+
+    function renderQueryCard(item) {
+        let feedbackHtml = '';
+        if (item.has_feedback) {
+            let stars = '';
+            for (let i = 0; i < 5; i++) {
+                stars += i < item.feedback_rating ? '<i class="fas fa-star"></i>' : '<i class="far fa-star"></i>';
+            }
+            const comments = item.feedback_comments ? `
+                <div class="feedback-comments mt-2">
+                    <small><em>"${escapeHtml(item.feedback_comments)}"</em></small>
+                </div>
+            ` : '';
+            feedbackHtml = `
+                <div class="feedback-info mt-3 pt-2 border-top">
+                    <div class="d-flex justify-content-between align-items-center">
+                        <div class="star-rating">${stars}</div>
+                        <small class="text-muted">
+                            Feedback provided on ${formatDate(item.feedback_timestamp).slice(0, 10)}
+                        </small>
+                    </div>
+                    ${comments}
+                </div>
+            `;
+        }
+
+        return `
+            <div class="col-12 mb-3">
+                <div class="card query-card">
+                    <div class="card-header d-flex justify-content-between align-items-center">
+                        <span class="query-text text-primary">
+                            <i class="fas fa-question-circle me-2"></i>${escapeHtml(item.query_text)}
+                        </span>
+                        <span class="query-date text-muted">
+                            ${formatDate(item.timestamp)}
+                        </span>
+                    </div>
+                    <div class="card-body">
+                        <p class="response-text small">${escapeHtml(item.response_preview)}</p>
+                        ${feedbackHtml}
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Match the server-side 'YYYY-MM-DD HH:MM' format
+    function formatDate(isoString) {
+        return isoString ? isoString.slice(0, 16).replace('T', ' ') : '';
+    }
+
+    // Helper function to escape HTML
+    function escapeHtml(unsafe) {
+        return unsafe
+            .replace(/&/g, "&amp;")
+            .replace(/</g, "&lt;")
+            .replace(/>/g, "&gt;")
+            .replace(/"/g, "&quot;")
+            .replace(/'/g, "&#039;");
+    }
+});
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time, so point it at a scratch
+# database and switch off background threads before any test imports it
+_database_dir = tempfile.mkdtemp(prefix="brazil_law_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_database_dir}/test.db")
+os.environ.setdefault("SESSION_SECRET", "test-secret")
+os.environ.setdefault("STATS_RECONCILE_INTERVAL", "0")
+os.environ.setdefault("KB_RELOAD_INTERVAL", "0")
+os.environ.setdefault("PASSWORD_HASH_TARGET_MS", "0")
+# The test client never closes responses, so chat concurrency slots would not be released
+os.environ.setdefault("CHAT_MAX_CONCURRENCY", "0")
+# Fail any request that runs more SQL statements than its view's budget
+os.environ.setdefault("SQL_STATEMENT_BUDGET_MODE", "raise")
+os.environ.setdefault("METRICS_DIR", os.path.join(_database_dir, "metrics"))
+
+
+@pytest.fixture
+def flask_app():
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def user(flask_app):
+    """A user stored in the test database, removed again afterwards."""
+    from app import db
+    from models import User
+
+    with flask_app.app_context():
+        db_user = User(username="tester", email="tester@example.com")
+        db.session.add(db_user)
+        db.session.commit()
+        user_id = db_user.id
+    yield user_id
+    with flask_app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+@pytest.fixture
+def admin(flask_app):
+    """An administrator stored in the test database, removed again afterwards."""
+    from app import db
+    from models import User
+
+    with flask_app.app_context():
+        db_user = User(username="admin", email="admin@example.com", is_admin=True)
+        db.session.add(db_user)
+        db.session.commit()
+        user_id = db_user.id
+    yield user_id
+    with flask_app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+def log_in(client, user_id):
+    """Log the test client in as ``user_id`` without going through the password form."""
+    with client.session_transaction() as flask_session:
+        flask_session["_user_id"] = str(user_id)
+        flask_session["_fresh"] = True
@@ -0,0 +1,44 @@
+import app as app_module
+from tests.conftest import log_in
+
+
+def test_cache_stats_include_the_user_cache(client, admin):
+    app_module.user_cache.clear()
+    log_in(client, admin)
+
+    client.get('/admin/cache')
+    stats = client.get('/admin/cache').get_json()
+
+    assert stats['user_cache']['misses'] >= 1
+    assert stats['user_cache']['hits'] >= 1
+    assert stats['user_cache']['size'] >= 1
+
+
+def test_admin_stats_require_an_administrator(client, user):
+    log_in(client, user)
+    assert client.get('/admin/cache').status_code == 302
+
+
+def test_write_stats_report_the_write_behind_queue(client, admin, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "CHAT_WRITE_BEHIND", True)
+    log_in(client, admin)
+    before = client.get('/admin/writes').get_json()
+
+    client.post('/api/chat', json={'message': 'eviction notice'})
+    app_module.chat_writer.flush()
+    after = client.get('/admin/writes').get_json()
+
+    assert after['enabled'] is True
+    assert after['written'] == before['written'] + 1
+    assert after['queued'] == 0
+
+
+def test_rate_limit_stats_include_password_hashing(client, admin):
+    log_in(client, admin)
+    before = client.get('/admin/rate-limits').get_json()['password_hashing']
+
+    app_module.password_hasher.hash("correct horse")
+    after = client.get('/admin/rate-limits').get_json()['password_hashing']
+
+    assert after['hashed'] == before['hashed'] + 1
+    assert after['method'] == app_module.password_hasher.method
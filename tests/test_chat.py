@@ -0,0 +1,54 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+
+
+def conversation_count():
+    return len(app_module.conversations._conversations)
+
+
+@pytest.mark.parametrize("endpoint", ["/api/chat", "/api/chat/stream"])
+@pytest.mark.parametrize("body", [
+    {"message": ""},
+    {"message": "   "},
+    {"message": 42},
+    {"message": "eviction notice", "history": "not a list"},
+    {"message": "eviction notice", "history": [{"role": "user"}]},
+    {"message": "eviction notice", "conversation_id": ["x"]},
+    ["eviction notice"],
+])
+def test_invalid_requests_are_refused_before_a_conversation_starts(client, endpoint, body):
+    before = conversation_count()
+    response = client.post(endpoint, json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert conversation_count() == before
+
+
+def test_conversation_keeps_history_between_turns(client):
+    first = client.post("/api/chat", json={"message": "eviction notice"}).get_json()
+    conversation_id = first["conversation_id"]
+
+    second = client.post("/api/chat", json={"message": "and the deposit?", "conversation_id": conversation_id})
+    assert second.get_json()["conversation_id"] == conversation_id
+    assert app_module.conversations.get_history(conversation_id)[:2] == ["eviction notice", first["response"]]
+
+
+def test_legacy_history_seeds_a_new_conversation(client):
+    response = client.post("/api/chat", json={
+        "message": "and the deposit?",
+        "history": ["eviction notice", "an earlier answer", "and the deposit?"],
+    })
+    conversation_id = response.get_json()["conversation_id"]
+    assert app_module.conversations.get_history(conversation_id)[:2] == ["eviction notice", "an earlier answer"]
+
+
+def test_conversations_are_only_created_by_chat(client):
+    before = conversation_count()
+    assert client.post("/api/conversations").status_code in (404, 405)
+    assert conversation_count() == before
@@ -0,0 +1,72 @@
+import pytest
+
+import app as app_module
+from tests.conftest import log_in
+from utils.rate_limit import MemoryBucketStore
+
+
+@pytest.fixture(autouse=True)
+def answers(monkeypatch):
+    """Answer instantly and record which messages were actually answered."""
+    answered = []
+
+    def answer(message, history):
+        answered.append(message)
+        return message.lower(), f"answer to {message}", [], {"backend": "local"}
+
+    monkeypatch.setattr(app_module, "_answer_message", answer)
+    monkeypatch.setattr(app_module.rate_limiter, "store", MemoryBucketStore())
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", True)
+    return answered
+
+
+def test_requires_login_or_partner_key(client, answers):
+    response = client.post("/api/chat/batch", json={"messages": ["hello"]})
+    assert response.status_code == 401
+
+    response = client.post("/api/chat/batch", json={"messages": ["hello"]}, headers={"X-API-Key": "wrong"})
+    assert response.status_code == 401
+    assert answers == []
+
+
+def test_partner_key_is_accepted(client, flask_app, monkeypatch):
+    monkeypatch.setitem(flask_app.config, "CHAT_BATCH_API_KEYS", ["partner-secret"])
+    response = client.post("/api/chat/batch", json={"messages": ["hello"]}, headers={"X-API-Key": "partner-secret"})
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["response"] == "answer to hello"
+
+
+def test_duplicates_are_answered_once_in_order(client, user, answers):
+    log_in(client, user)
+    messages = ["Rent increase?", "rent   increase?", "", "Eviction notice", "RENT INCREASE?"]
+    results = client.post("/api/chat/batch", json={"messages": messages}).get_json()["results"]
+
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert "error" in results[2]
+    assert len(answers) == 2
+    assert results[0]["response"] == results[1]["response"] == results[4]["response"]
+    # Every occurrence gets its own stored exchange for feedback
+    assert len({results[i]["query_id"] for i in (0, 1, 3, 4)}) == 4
+
+
+def test_rate_limit_is_charged_per_distinct_question(client, user, flask_app, answers):
+    log_in(client, user)
+    burst = int(app_module.rate_limiter.limits["chat"].burst)
+    questions = [f"question {i}" for i in range(burst - 1)]
+
+    # Duplicates are free, so this costs burst - 1 tokens
+    response = client.post("/api/chat/batch", json={"messages": questions + questions})
+    assert response.status_code == 200
+
+    response = client.post("/api/chat/batch", json={"messages": ["another", "and another"]})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert len(answers) == burst - 1
+
+
+def test_batch_over_the_burst_is_refused(client, user, answers):
+    log_in(client, user)
+    burst = int(app_module.rate_limiter.limits["chat"].burst)
+    response = client.post("/api/chat/batch", json={"messages": [f"question {i}" for i in range(burst + 1)]})
+    assert response.status_code == 413
+    assert answers == []
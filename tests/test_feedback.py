@@ -0,0 +1,47 @@
+import uuid
+
+import pytest
+
+import app as app_module
+from utils.rate_limit import MemoryBucketStore
+
+
+@pytest.fixture
+def write_behind(flask_app, monkeypatch):
+    monkeypatch.setitem(flask_app.config, "CHAT_WRITE_BEHIND", True)
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    flushes = []
+    flush = app_module.chat_writer.flush
+    monkeypatch.setattr(app_module.chat_writer, "flush", lambda: flushes.append(1) or flush())
+    return flushes
+
+
+def test_queued_exchange_accepts_feedback(client, write_behind):
+    query_id = client.post("/api/chat", json={"message": "eviction notice"}).get_json()["query_id"]
+    response = client.post("/api/feedback", json={"query_id": query_id, "rating": 5})
+    assert response.status_code == 200
+    assert write_behind == [1]
+
+
+@pytest.mark.parametrize("query_id", ["not-an-id", "Z" * 32, uuid.uuid4().hex.upper(), "a" * 33])
+def test_malformed_public_ids_do_not_flush(client, write_behind, query_id):
+    response = client.post("/api/feedback", json={"query_id": query_id, "rating": 3})
+    assert response.status_code == 404
+    assert write_behind == []
+
+
+def test_unknown_public_id_flushes_once(client, write_behind):
+    response = client.post("/api/feedback", json={"query_id": uuid.uuid4().hex, "rating": 3})
+    assert response.status_code == 404
+    assert write_behind == [1]
+
+
+def test_feedback_is_rate_limited(client, monkeypatch):
+    monkeypatch.setattr(app_module.rate_limiter, "store", MemoryBucketStore())
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", True)
+    burst = int(app_module.rate_limiter.limits["feedback"].burst)
+    statuses = [
+        client.post("/api/feedback", json={"query_id": uuid.uuid4().hex, "rating": 3}).status_code
+        for _ in range(burst + 1)
+    ]
+    assert statuses == [404] * burst + [429]
@@ -0,0 +1,13 @@
+import pytest
+
+from utils.local_knowledge_base import get_relevant_info
+from utils.nlp_processor import preprocess_query
+
+
+@pytest.mark.parametrize("query", ["eviction notice", "rent increase", "repairs"])
+def test_short_queries_are_answered_from_their_own_words(query):
+    assert get_relevant_info(preprocess_query(query)) == get_relevant_info(query)
+
+
+def test_short_query_context_does_not_pick_tenant_rights():
+    assert "despejo" in get_relevant_info(preprocess_query("eviction notice"))
@@ -0,0 +1,28 @@
+import logging
+import queue
+
+from utils.log_config import DeferredQueueHandler
+
+
+def test_records_are_queued_unformatted():
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    logger = logging.getLogger("tests.log_config")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        items = ["a"]
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed on %s", items)
+        items.append("b")
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+    record = records.get_nowait()
+    # Arguments are captured when logged; the traceback is left for the listener
+    assert record.msg == "failed on ['a']" and record.args is None
+    assert record.exc_info is not None and record.exc_text is None
+    assert "ValueError: boom" in logging.Formatter().format(record)
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from app import db
+from tests.conftest import log_in
+from utils.pagination import decode_cursor, encode_cursor, parse_page_size
+
+
+@pytest.fixture
+def history(flask_app, user):
+    """Seven exchanges for ``user`` where most timestamps are shared by several rows."""
+    from models import ChatQuery
+
+    base = datetime(2025, 3, 1, 12, 0, 0)
+    offsets = [0, 0, 0, 1, 1, 2, 2]
+    with flask_app.app_context():
+        rows = [
+            ChatQuery(user_id=user, query_text=f"question {i}", response_text="answer",
+                      timestamp=base + timedelta(seconds=offset))
+            for i, offset in enumerate(offsets)
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        expected = [row.id for row in sorted(rows, key=lambda row: (row.timestamp, row.id), reverse=True)]
+    yield expected
+    with flask_app.app_context():
+        ChatQuery.query.filter_by(user_id=user).delete()
+        db.session.commit()
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2025, 3, 1, 12, 0, 0, 123456)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+    assert decode_cursor(None) is None
+    assert decode_cursor("not a cursor") is None
+
+
+def test_page_size_is_clamped():
+    assert parse_page_size(None, 20, 100) == 20
+    assert parse_page_size("500", 20, 100) == 100
+    assert parse_page_size("0", 20, 100) == 1
+    assert parse_page_size("lots", 20, 100) == 20
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 10])
+def test_pages_split_timestamp_ties_without_gaps_or_repeats(client, user, history, page_size):
+    log_in(client, user)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": page_size, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/profile/history", query_string=params).get_json()
+        seen += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == history
+    assert pages == max(1, -(-len(history) // page_size))
+
+
+def test_previews_are_shortened_once_for_page_and_api(client, flask_app, user):
+    from models import ChatQuery
+
+    long_response = " ".join(f"word{i}" for i in range(100))
+    long_query = " ".join(f"term{i}" for i in range(100))
+    short_response = "A short answer."
+    with flask_app.app_context():
+        db.session.add_all([
+            ChatQuery(user_id=user, query_text=long_query, response_text=long_response,
+                      timestamp=datetime(2025, 3, 2)),
+            ChatQuery(user_id=user, query_text="short", response_text=short_response,
+                      timestamp=datetime(2025, 3, 1)),
+        ])
+        db.session.commit()
+    try:
+        log_in(client, user)
+        long_item, short_item = client.get("/api/profile/history").get_json()["items"]
+        page = client.get("/profile").get_data(as_text=True)
+    finally:
+        with flask_app.app_context():
+            ChatQuery.query.filter_by(user_id=user).delete()
+            db.session.commit()
+
+    preview = long_item["response_preview"]
+    assert len(preview) <= app_module.HISTORY_RESPONSE_PREVIEW_CHARS
+    assert preview.endswith("...") and long_response.startswith(preview[:-3])
+    # Cut between words
+    assert long_response[len(preview) - 3] == " "
+    assert len(long_item["query_text"]) <= app_module.HISTORY_QUERY_PREVIEW_CHARS
+    assert long_item["query_text"].endswith("...")
+    assert short_item["response_preview"] == short_response
+
+    assert preview in page and long_item["query_text"] in page
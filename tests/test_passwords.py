@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_round_trip():
+    hasher = PasswordHasher()
+    password_hash = hasher.hash("correct horse")
+    assert hasher.verify(password_hash, "correct horse")
+    assert not hasher.verify(password_hash, "wrong")
+    assert not hasher.needs_rehash(password_hash)
+    assert PasswordHasher(n=2 ** 16).needs_rehash(password_hash)
+
+
+def test_concurrent_requests_beyond_max_pending_are_shed():
+    hasher = PasswordHasher(max_workers=1, max_pending=1, queue_timeout=0.01)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_hash(*args):
+        started.set()
+        release.wait(5)
+        return "done"
+
+    holder = threading.Thread(target=hasher._run, args=(slow_hash,))
+    holder.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("another request thread")
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        release.set()
+        holder.join()
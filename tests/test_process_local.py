@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from utils.process_local import ProcessLocal
+
+
+def test_value_is_created_once_per_process():
+    created = []
+    local = ProcessLocal(lambda: created.append(1) or object())
+    assert local.peek() is None
+    value = local.get()
+    assert local.get() is value and local.peek() is value
+    assert len(created) == 1
+
+    local.reset()
+    assert local.get() is not value
+    assert len(created) == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_creates_its_own_value():
+    local = ProcessLocal(os.getpid)
+    assert local.get() == os.getpid()
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        ok = local.peek() is None and local.get() == os.getpid()
+        os.write(write_end, b"1" if ok else b"0")
+        os._exit(0)
+    os.close(write_end)
+    result = os.read(read_end, 1)
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    assert result == b"1"
+    assert local.get() != pid
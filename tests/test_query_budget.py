@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from app import db
+from tests.conftest import log_in
+from utils.query_budget import count_statements
+
+
+@pytest.fixture
+def seed_queries(flask_app):
+    """Add ``count`` recent chat queries, each from a different user."""
+    from models import ChatQuery, User
+
+    seeded = []
+
+    def seed(count):
+        with flask_app.app_context():
+            start = len(seeded)
+            users = [User(username=f"budget-user-{i}", email=f"budget-user-{i}@example.com")
+                     for i in range(start, start + count)]
+            db.session.add_all(users)
+            db.session.flush()
+            db.session.add_all([
+                ChatQuery(user_id=user.id, query_text="question", response_text="answer",
+                          timestamp=datetime.utcnow() + timedelta(seconds=i))
+                for i, user in enumerate(users)
+            ])
+            db.session.commit()
+            seeded.extend(user.id for user in users)
+
+    yield seed
+    with flask_app.app_context():
+        ChatQuery.query.filter(ChatQuery.user_id.in_(seeded)).delete()
+        User.query.filter(User.id.in_(seeded)).delete()
+        db.session.commit()
+
+
+def admin_dashboard_statements(client):
+    # Start from a cold user cache so the count does not depend on earlier requests
+    app_module.user_cache.clear()
+    with app_module.app.app_context():
+        engine = db.engine
+    with count_statements(engine) as counter:
+        response = client.get("/admin")
+    assert response.status_code == 200
+    return counter.count
+
+
+def test_admin_dashboard_statements_do_not_grow_with_recent_queries(client, admin, seed_queries):
+    log_in(client, admin)
+    seed_queries(2)
+    few = admin_dashboard_statements(client)
+    seed_queries(15)
+    many = admin_dashboard_statements(client)
+
+    assert few == many == 4
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app  # noqa: F401  (models must be imported after the app)
+from app import db
+from utils.query_plans import HOT_QUERIES, check_query_plans
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An engine on a fresh SQLite database with the app's tables and indexes."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def plan_problems(engine):
+    # Pooled connections cache prepared statements across schema changes
+    engine.dispose()
+    with Session(engine) as session:
+        return check_query_plans(session)
+
+
+def test_hot_queries_are_registered():
+    assert {"profile_history_first_page", "profile_history_next_page", "admin_recent_queries",
+            "feedback_by_public_id", "admin_active_users", "login_user_by_username"} <= set(HOT_QUERIES)
+
+
+def test_every_hot_query_uses_an_index(flask_app):
+    with flask_app.app_context():
+        assert check_query_plans(db.session) == {}
+
+
+@pytest.mark.parametrize("index, queries", [
+    ("ix_chat_query_user_id_timestamp", {"profile_history_first_page", "profile_history_next_page"}),
+    ("ix_chat_query_timestamp", {"admin_recent_queries"}),
+])
+def test_missing_index_is_reported(engine, index, queries):
+    assert plan_problems(engine) == {}
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP INDEX {index}")
+    assert queries <= set(plan_problems(engine))
+
+
+def test_reordered_index_is_reported(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_chat_query_user_id_timestamp")
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_chat_query_user_id_timestamp ON chat_query (timestamp, user_id, id)")
+    assert {"profile_history_first_page", "profile_history_next_page"} <= set(plan_problems(engine))
@@ -0,0 +1,24 @@
+import pytest
+
+from utils.rate_limit import ConcurrencyLimiter, MemoryBucketStore, RateLimit
+
+
+def test_bucket_charges_cost_and_reports_wait():
+    store = MemoryBucketStore()
+    limit = RateLimit(rate=1.0, burst=5)
+    assert store.take("client", limit, cost=4) == (True, 0.0)
+    allowed, retry_after = store.take("client", limit, cost=3)
+    assert not allowed
+    assert retry_after == pytest.approx(2.0, abs=0.1)
+    # A refused request takes nothing
+    assert store.take("client", limit)[0]
+
+
+def test_concurrency_limiter_refuses_beyond_cap():
+    limiter = ConcurrencyLimiter(2)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+    assert limiter.stats() == {"max_concurrent": 2, "in_flight": 2, "peak": 2, "admitted": 3, "rejected": 1}
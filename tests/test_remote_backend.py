@@ -0,0 +1,184 @@
+import time
+
+import pytest
+
+from benchmarks.stub_backend import start_stub_server
+from utils.perplexity_client import (
+    CircuitBreaker, RemoteBackendError, RemoteChatBackend, configure_remote_backend, get_chat_response,
+)
+
+MESSAGES = [{"role": "user", "content": "can my landlord raise the rent?"}]
+
+
+@pytest.fixture
+def stub():
+    server, _ = start_stub_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_deadline_bounds_slow_attempts_and_retries(stub):
+    stub.latency = 0.3
+    backend = RemoteChatBackend(url=stub.url, read_timeout=0.2, deadline=0.5, max_retries=10, backoff_base=0.01)
+
+    start = time.monotonic()
+    with pytest.raises(RemoteBackendError):
+        backend.complete(MESSAGES)
+    assert time.monotonic() - start < 0.8
+    assert backend.stats()["deadline_exceeded"] == 1
+    assert backend.retries < 10
+
+
+def test_pooled_session_reuses_one_connection(stub):
+    backend = RemoteChatBackend(url=stub.url)
+    for _ in range(5):
+        data = backend.complete(MESSAGES)
+    assert data["choices"][0]["message"]["content"].startswith("Stub answer to: can my landlord")
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+
+def test_retryable_status_is_retried_then_counted_once(stub):
+    stub.failure_rate = 1.0
+    backend = RemoteChatBackend(url=stub.url, max_retries=2, backoff_base=0.01,
+                                breaker=CircuitBreaker(failure_threshold=5))
+    with pytest.raises(RemoteBackendError, match="503"):
+        backend.complete(MESSAGES)
+    assert stub.requests == 3
+    assert backend.stats()["retries"] == 2
+    assert backend.breaker.stats()["consecutive_failures"] == 1
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.failure_rate, stub.failure_status = 1.0, 400
+    backend = RemoteChatBackend(url=stub.url, max_retries=2)
+    with pytest.raises(RemoteBackendError, match="request failed"):
+        backend.complete(MESSAGES)
+    assert stub.requests == 1
+
+
+def test_open_circuit_falls_back_without_calling_the_backend(stub):
+    stub.failure_rate = 1.0
+    backend = RemoteChatBackend(url=stub.url, max_retries=0, breaker=CircuitBreaker(failure_threshold=2))
+    configure_remote_backend(backend)
+    try:
+        for _ in range(2):
+            assert get_chat_response(MESSAGES)["fallback"] is True
+        assert backend.breaker.state == "open"
+        requests_before = stub.requests
+
+        response = get_chat_response(MESSAGES)
+        assert response["fallback"] is True
+        assert response["choices"][0]["message"]["content"]
+        assert stub.requests == requests_before
+    finally:
+        configure_remote_backend(None)
+
+
+def test_half_open_trial_closes_the_circuit_on_success(stub):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    backend = RemoteChatBackend(url=stub.url, max_retries=0, breaker=breaker)
+    stub.failure_rate = 1.0
+    with pytest.raises(RemoteBackendError):
+        backend.complete(MESSAGES)
+    assert breaker.state == "open"
+
+    stub.failure_rate = 0.0
+    time.sleep(0.06)
+    backend.complete(MESSAGES)
+    assert breaker.state == "closed"
+
+
+def test_unexpected_error_during_trial_does_not_wedge_the_circuit(stub, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    backend = RemoteChatBackend(url=stub.url, max_retries=0, breaker=breaker)
+    stub.failure_rate = 1.0
+    with pytest.raises(RemoteBackendError):
+        backend.complete(MESSAGES)
+
+    time.sleep(0.06)
+    with monkeypatch.context() as patch:
+        patch.setattr(backend, "_get_session", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+        with pytest.raises(RuntimeError):
+            backend.complete(MESSAGES)
+    assert breaker.state == "open"
+
+    stub.failure_rate = 0.0
+    time.sleep(0.06)
+    backend.complete(MESSAGES)
+    assert breaker.state == "closed"
+
+
+MALFORMED_BODIES = [
+    {"choices": []},
+    [{"message": {"content": "a list, not an object"}}],
+    {"choices": [{"message": {"role": "assistant", "content": None}}]},
+    {"choices": [{"message": {"role": "assistant", "content": "  "}}]},
+    {"error": "quota"},
+    {"choices": [{"message": {"content": "An answer"}}], "citations": "not a list"},
+]
+
+
+@pytest.mark.parametrize("body", MALFORMED_BODIES)
+def test_malformed_answers_count_as_failures(stub, body):
+    stub.response_body = body
+    backend = RemoteChatBackend(url=stub.url, max_retries=2, breaker=CircuitBreaker(failure_threshold=2))
+    for _ in range(2):
+        with pytest.raises(RemoteBackendError):
+            backend.complete(MESSAGES)
+    # Not retried, and the circuit opens as for any other failure
+    assert stub.requests == 2
+    assert backend.breaker.state == "open"
+
+
+@pytest.mark.parametrize("body", MALFORMED_BODIES)
+def test_chat_falls_back_and_does_not_cache_malformed_answers(stub, client, flask_app, monkeypatch, body):
+    import app as app_module
+
+    stub.response_body = body
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    monkeypatch.setitem(flask_app.config, "ROUTER_ENABLED", False)
+    app_module.response_cache.clear()
+    configure_remote_backend(RemoteChatBackend(url=stub.url, max_retries=0))
+    try:
+        response = client.post("/api/chat", json={"message": "can my landlord keep my deposit?"})
+    finally:
+        configure_remote_backend(None)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["response"]
+    assert data["route"]["reason"] == "remote backend failed"
+    assert app_module.response_cache.stats()["size"] == 0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+        for _ in range(5):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert breaker.stats()["opened"] == 2
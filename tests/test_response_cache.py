@@ -0,0 +1,65 @@
+from utils.response_cache import LRUCache, history_fingerprint, make_cache_key
+
+
+def test_key_ignores_case_and_whitespace():
+    assert make_cache_key("Can my  landlord\nevict me?", [], 4) == make_cache_key("can my landlord evict me?", [], 4)
+    assert make_cache_key("evict me?", [], 4) != make_cache_key("evict me", [], 4)
+
+
+def test_key_depends_only_on_recent_history():
+    recent = ["q2", "a2", "q3", "a3"]
+    assert make_cache_key("and now?", ["q1", "a1"] + recent, 4) == make_cache_key("and now?", recent, 4)
+    assert make_cache_key("and now?", recent, 4) != make_cache_key("and now?", ["q2", "other", "q3", "a3"], 4)
+    assert history_fingerprint(["q1", "a1"], 0) == history_fingerprint([], 0)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_zero_size_disables_caching():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_key_changes_with_knowledge_base_version():
+    assert make_cache_key("evict me?", [], 4, "v1") != make_cache_key("evict me?", [], 4, "v2")
+
+
+def test_answers_are_not_served_across_knowledge_base_versions(client, monkeypatch):
+    import app as app_module
+    from utils import knowledge_state
+
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    app_module.response_cache.clear()
+    lookups = app_module.response_cache.stats()
+    body = {"message": "can my landlord evict me without notice?"}
+
+    client.post("/api/chat", json=body)
+    client.post("/api/chat", json=body)
+    assert app_module.response_cache.stats()["hits"] == lookups["hits"] + 1
+
+    # An answer computed from the old version is never looked up under the new one
+    monkeypatch.setattr(knowledge_state, "_state", knowledge_state.current()._replace(version="next-version"))
+    client.post("/api/chat", json=body)
+    assert app_module.response_cache.stats()["hits"] == lookups["hits"] + 1
+    assert app_module.response_cache.stats()["misses"] == lookups["misses"] + 2
+
+
+def test_reload_clears_the_response_cache(monkeypatch):
+    import app as app_module
+    from utils import knowledge_state
+
+    # The original state is put back for the tests that follow
+    monkeypatch.setattr(knowledge_state, "_state", knowledge_state.current())
+    app_module.response_cache.put(("old-version", "question", ""), "stale answer")
+    assert knowledge_state.reload_knowledge_base(force=True) is not None
+    assert app_module.response_cache.stats()["size"] == 0
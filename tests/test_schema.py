@@ -0,0 +1,50 @@
+import sqlite3
+
+from sqlalchemy import create_engine, inspect, text
+
+import app  # noqa: F401  (models must be imported after the app)
+from models import ChatQuery
+from utils.schema import upgrade_schema
+
+# chat_query as created by the first release, before public_id existed
+BASELINE_CHAT_QUERY = """
+CREATE TABLE chat_query (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER,
+    query_text TEXT NOT NULL,
+    response_text TEXT NOT NULL,
+    timestamp DATETIME,
+    has_feedback BOOLEAN,
+    feedback_rating INTEGER,
+    feedback_comments TEXT,
+    feedback_timestamp DATETIME
+)
+"""
+
+
+def test_upgrade_adds_and_backfills_public_id(tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute(BASELINE_CHAT_QUERY)
+        connection.executemany("INSERT INTO chat_query (query_text, response_text) VALUES (?, ?)",
+                               [(f"question {i}", "answer") for i in range(5)])
+
+    engine = create_engine(f"sqlite:///{path}")
+    upgrade_schema(engine)
+    for index in ChatQuery.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    with engine.connect() as connection:
+        public_ids = connection.execute(text("SELECT public_id FROM chat_query")).scalars().all()
+    assert len(public_ids) == 5
+    assert all(public_id and len(public_id) == 32 for public_id in public_ids)
+    assert len(set(public_ids)) == 5
+    assert "ix_chat_query_public_id" in {index["name"] for index in inspect(engine).get_indexes("chat_query")}
+
+
+def test_upgrade_is_a_no_op_on_a_current_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'current.db'}")
+    ChatQuery.__table__.metadata.create_all(engine)
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+    assert "public_id" in {column["name"] for column in inspect(engine).get_columns("chat_query")}
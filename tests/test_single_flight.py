@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def run_concurrently(flights, key, func):
+    """Call flights.do from several threads while ``func`` is held open; returns their outcomes."""
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        futures = [pool.submit(flights.do, key, func) for _ in range(CALLERS)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def blocking(result=None, error=None):
+    """A computation that waits until every caller has arrived."""
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        if error is not None:
+            raise error
+        return result
+
+    return func, release, calls
+
+
+def release_when_waiting(flights, release, waiting):
+    def watch():
+        while flights.stats()["coalesced"] < waiting:
+            threading.Event().wait(0.005)
+        release.set()
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    func, release, calls = blocking(result="answer")
+    release_when_waiting(flights, release, CALLERS - 1)
+
+    outcomes = run_concurrently(flights, "key", func)
+    assert len(calls) == 1
+    assert sorted(outcomes) == sorted([("answer", False)] + [("answer", True)] * (CALLERS - 1))
+    assert flights.stats() == {"enabled": True, "in_flight": 0, "executed": 1, "coalesced": CALLERS - 1}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flights = SingleFlight()
+    func, release, calls = blocking(error=ValueError("backend down"))
+    release_when_waiting(flights, release, CALLERS - 1)
+
+    outcomes = run_concurrently(flights, "key", func)
+    assert len(calls) == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_finished_calls_are_not_reused():
+    flights = SingleFlight()
+    results = iter(["first", "second"])
+    assert flights.do("key", lambda: next(results)) == ("first", False)
+    assert flights.do("key", lambda: next(results)) == ("second", False)
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight()
+    assert flights.do("a", lambda: 1) == (1, False)
+    assert flights.do("b", lambda: 2) == (2, False)
+    assert flights.stats()["executed"] == 2
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+    calls = []
+    for _ in range(3):
+        assert flights.do("key", lambda: calls.append(1)) == (None, False)
+    assert len(calls) == 3
+    with pytest.raises(ZeroDivisionError):
+        flights.do("key", lambda: 1 / 0)
@@ -0,0 +1,44 @@
+import time
+
+from app import db
+from utils.stats import (
+    LAST_RECONCILED, TOTAL_QUERIES, TOTAL_QUERIES_SHARDS, get_dashboard_stats, reconcile_stats,
+    reconcile_stats_if_due, record_chat_queries,
+)
+
+
+def test_query_total_is_spread_over_shards_and_summed(flask_app, user):
+    from models import StatCounter
+    with flask_app.app_context():
+        reconcile_stats(db.session)
+        before = get_dashboard_stats(db.session)["total_queries"]
+
+        for _ in range(50):
+            record_chat_queries(db.session, [user, None])
+            db.session.commit()
+
+        shards = db.session.scalars(
+            db.select(StatCounter.name).where(StatCounter.name.startswith(TOTAL_QUERIES))
+        ).all()
+        assert 1 < len(shards) <= TOTAL_QUERIES_SHARDS
+        assert get_dashboard_stats(db.session)["total_queries"] == before + 100
+
+        # Reconciling folds the shards back into one row
+        reconcile_stats(db.session)
+        shards = db.session.scalars(
+            db.select(StatCounter.name).where(StatCounter.name.startswith(TOTAL_QUERIES))
+        ).all()
+        assert shards == [TOTAL_QUERIES]
+
+
+def test_reconciliation_is_skipped_when_recent(flask_app):
+    from models import StatCounter
+    with flask_app.app_context():
+        reconcile_stats(db.session)
+        assert not reconcile_stats_if_due(db.session, max_age=60)
+
+        db.session.get(StatCounter, LAST_RECONCILED).value = int(time.time()) - 120
+        db.session.commit()
+        assert reconcile_stats_if_due(db.session, max_age=60)
+        assert time.time() - db.session.get(StatCounter, LAST_RECONCILED).value < 60
+
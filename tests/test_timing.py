@@ -0,0 +1,23 @@
+import app as app_module
+from tests.conftest import log_in
+
+
+def test_single_request_reports_each_stage_once(client, monkeypatch):
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    response = client.post("/api/chat", json={"message": "what are my rights as a tenant?"})
+    names = [entry.split(";")[0].strip() for entry in response.headers["Server-Timing"].split(",")]
+    assert len(names) == len(set(names))
+    assert "cache_lookup" in names
+
+
+def test_batch_header_stays_bounded(client, user, flask_app, monkeypatch):
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    monkeypatch.setitem(flask_app.config, "CHAT_BATCH_MAX_ITEMS", 200)
+    log_in(client, user)
+    messages = [f"question number {i} about my lease" for i in range(200)]
+
+    response = client.post("/api/chat/batch", json={"messages": messages})
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    assert len(header) < 1024
+    assert 'desc="Response cache lookup x200"' in header
@@ -0,0 +1,143 @@
+from typing import Any, Callable, Dict
+
+def _render_tenant_rights(tenant_rights: Dict[str, Any]) -> str:
+    """Render the answer for tenant rights queries."""
+    rights = tenant_rights.get("basic_rights", [])
+
+    response = "As a tenant in Brazil, you have these rights under the Lei do Inquilinato (Lei nº 8.245/91):\n\n"
+    for right in rights:
+        response += f"- {right}\n"
+
+    # Add rent adjustment info
+    rent_info = tenant_rights.get("rent_adjustments", {})
+    if rent_info:
+        response += f"\nRegarding rent: {rent_info.get('description', '')}"
+
+    # Add security deposit info
+    deposit_info = tenant_rights.get("security_deposits", {})
+    if deposit_info:
+        response += f"\n\nRegarding deposits: {deposit_info.get('description', '')}"
+
+    return response
+
+def _render_landlord_obligations(landlord_info: Dict[str, Any]) -> str:
+    """Render the answer for landlord obligation queries."""
+    duties = landlord_info.get("main_duties", [])
+
+    response = "In Brazil, landlords have these obligations under the Lei do Inquilinato (Lei nº 8.245/91):\n\n"
+    for duty in duties:
+        response += f"- {duty}\n"
+
+    # Add illegal practices
+    illegal = landlord_info.get("illegal_practices", [])
+    if illegal:
+        response += "\nLandlords are prohibited from:\n"
+        for practice in illegal:
+            response += f"- {practice}\n"
+
+    return response
+
+def _render_rental_contracts(contract_info: Dict[str, Any]) -> str:
+    """Render the answer for rental contract queries."""
+    types = contract_info.get("types", {})
+
+    response = "In Brazil, rental contracts are governed by the Lei do Inquilinato (Lei nº 8.245/91):\n\n"
+
+    if "fixed_term" in types:
+        fixed = types["fixed_term"]
+        response += f"Fixed-term contracts: {fixed.get('description', '')}\n\n"
+
+    if "indefinite_term" in types:
+        indef = types["indefinite_term"]
+        response += f"Indefinite-term contracts: {indef.get('description', '')}\n\n"
+
+    # Add document requirements
+    docs = contract_info.get("required_documents", {}).get("for_tenants", [])
+    if docs:
+        response += "Required documents typically include:\n"
+        for doc in docs:
+            response += f"- {doc}\n"
+
+    return response
+
+def _render_eviction_process(eviction_info: Dict[str, Any]) -> str:
+    """Render the answer for eviction queries."""
+    grounds = eviction_info.get("grounds", [])
+
+    response = "In Brazil, eviction (despejo) can only occur on these grounds under the Lei do Inquilinato (Lei nº 8.245/91):\n\n"
+    for ground in grounds:
+        response += f"- {ground}\n"
+
+    # Add procedure info
+    procedure = eviction_info.get("procedure", {})
+    if procedure:
+        steps = procedure.get("steps", [])
+        if steps:
+            response += "\nThe eviction process follows these steps:\n"
+            for i, step in enumerate(steps, 1):
+                response += f"{i}. {step}\n"
+
+    return response
+
+def _render_common_disputes(dispute_info: Dict[str, Any]) -> str:
+    """Render the answer for dispute queries."""
+    response = "Common disputes between landlords and tenants in Brazil include:\n\n"
+
+    if "repair_issues" in dispute_info:
+        repairs = dispute_info["repair_issues"]
+        response += f"Repairs: {repairs.get('description', '')} "
+        response += f"Resolution: {repairs.get('resolution', '')}\n\n"
+
+    if "rent_increases" in dispute_info:
+        rent = dispute_info["rent_increases"]
+        response += f"Rent increases: {rent.get('description', '')} "
+        response += f"Resolution: {rent.get('resolution', '')}\n\n"
+
+    if "security_deposit" in dispute_info:
+        deposit = dispute_info["security_deposit"]
+        response += f"Security deposits: {deposit.get('description', '')} "
+        response += f"Resolution: {deposit.get('resolution', '')}\n\n"
+
+    return response
+
+def _render_general() -> str:
+    """Render the fallback answer used when no topic matches the query."""
+    response = "Brazilian housing laws, particularly the Lei do Inquilinato (Lei nº 8.245/91), cover various aspects of the landlord-tenant relationship including:\n\n"
+    response += "- Tenant rights and protections\n"
+    response += "- Landlord obligations and responsibilities\n"
+    response += "- Rental contract requirements and terms\n"
+    response += "- Eviction procedures and tenant protections\n"
+    response += "- Common dispute resolution mechanisms\n\n"
+    response += "Could you please specify which aspect of Brazilian housing laws you're interested in?"
+    return response
+
+# Knowledge base topics that have a dedicated answer, keyed by top-level section
+TOPIC_RENDERERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "tenant_rights": _render_tenant_rights,
+    "landlord_obligations": _render_landlord_obligations,
+    "rental_contracts": _render_rental_contracts,
+    "eviction_process": _render_eviction_process,
+    "common_disputes": _render_common_disputes,
+}
+
+def render_topic_answers(knowledge_base: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Render the answer for every topic the knowledge base covers.
+
+    Answers depend only on the knowledge base, never on the query, so they are
+    rendered once per knowledge base version rather than per request.
+
+    Args:
+        knowledge_base: The parsed knowledge base JSON
+
+    Returns:
+        The rendered answers keyed by topic
+    """
+    return {
+        topic: render(knowledge_base[topic])
+        for topic, render in TOPIC_RENDERERS.items()
+        if topic in knowledge_base
+    }
+
+# The fallback answer does not depend on the knowledge base
+GENERAL_ANSWER = _render_general()
@@ -0,0 +1,91 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional
+
+
+class _Conversation:
+    __slots__ = ("messages", "last_access")
+
+    def __init__(self, max_messages: int):
+        self.messages: Deque[str] = deque(maxlen=max_messages)
+        self.last_access = time.monotonic()
+
+
+class ConversationStore:
+    """
+    In-memory store of recent conversation turns, keyed by conversation ID.
+
+    Each conversation keeps a rolling window of its last ``max_turns``
+    user/assistant exchanges. Conversations idle for longer than ``ttl``
+    seconds expire, and once ``max_conversations`` are held the least recently
+    used one is evicted. The store is per process; a conversation that is not
+    found (expired, evicted or held by another worker) simply starts afresh.
+    """
+
+    def __init__(self, max_conversations: int = 10000, max_turns: int = 10, ttl: float = 1800):
+        self.max_conversations = max_conversations
+        self.max_messages = max_turns * 2
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        """Drop idle conversations; the oldest are at the front of the dict."""
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_access <= self.ttl:
+                break
+            del self._conversations[oldest_id]
+
+    def create(self) -> str:
+        """
+        Start a new conversation.
+
+        Returns:
+            The new conversation ID
+        """
+        conversation_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            while len(self._conversations) >= self.max_conversations:
+                self._conversations.popitem(last=False)
+            self._conversations[conversation_id] = _Conversation(self.max_messages)
+        return conversation_id
+
+    def get_history(self, conversation_id: str) -> Optional[List[str]]:
+        """
+        Return a conversation's messages, alternating user and assistant.
+
+        Args:
+            conversation_id: The ID returned by create()
+
+        Returns:
+            The windowed messages, or None if the conversation is unknown
+        """
+        now = time.monotonic()
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None or now - conversation.last_access > self.ttl:
+                self._conversations.pop(conversation_id, None)
+                return None
+            conversation.last_access = now
+            self._conversations.move_to_end(conversation_id)
+            return list(conversation.messages)
+
+    def append(self, conversation_id: str, user_message: str, assistant_message: str) -> None:
+        """Record one exchange; unknown conversations are ignored."""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return
+            conversation.messages.append(user_message)
+            conversation.messages.append(assistant_message)
+            conversation.last_access = time.monotonic()
+            self._conversations.move_to_end(conversation_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
@@ -0,0 +1,122 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import time
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# File layout:
+#   magic (8 bytes) | header length (u32) | header (JSON) | padding
+#   | arrays, each starting on a 64-byte boundary | pickled objects
+# The header records the format version, the version of the source the
+# snapshot was built from, and the dtype, length and offset (from the start of
+# the data section) of every array.
+SNAPSHOT_MAGIC = b"BLKBSNAP"
+SNAPSHOT_FORMAT_VERSION = 1
+_HEADER_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 64
+
+
+class SnapshotError(Exception):
+    """Raised for a missing, corrupt or incompatible snapshot file."""
+
+
+def _align(offset: int) -> int:
+    return offset + (-offset % _ALIGNMENT)
+
+
+def write_snapshot(path: str, source_version: str, objects: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write a snapshot file atomically.
+
+    Args:
+        path: Destination file
+        source_version: Identifies the source data, checked when loading
+        objects: Picklable values, unpickled into each process on load
+        arrays: NumPy arrays, memory-mapped on load rather than copied
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    pickled = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Offsets are relative to the data section, which starts after the header
+    array_entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        array_entries[name] = {"dtype": array.dtype.str, "offset": offset, "length": int(array.size)}
+        offset = _align(offset + array.nbytes)
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "source_version": source_version,
+        "built_at": time.time(),
+        "arrays": array_entries,
+        "objects": {"offset": offset, "length": len(pickled)},
+    }
+    encoded_header = json.dumps(header).encode("utf-8")
+    data_start = _align(len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size + len(encoded_header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(encoded_header)))
+            f.write(encoded_header)
+            for name, array in arrays.items():
+                f.seek(data_start + array_entries[name]["offset"])
+                f.write(array.tobytes())
+            f.seek(data_start + header["objects"]["offset"])
+            f.write(pickled)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Open a snapshot file.
+
+    Arrays are read-only views of a shared memory map, so every worker process
+    on the host uses the same physical pages for them. The pickled objects are
+    trusted: snapshots are build artifacts, never user input.
+
+    Returns:
+        A (header, objects, arrays) tuple
+
+    Raises:
+        SnapshotError: If the file is missing, corrupt or from another format version
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot open snapshot {path}: {e}") from e
+
+    try:
+        if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a knowledge base snapshot")
+        header_start = len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size
+        header_length = _HEADER_LENGTH.unpack_from(mapped, len(SNAPSHOT_MAGIC))[0]
+        header = json.loads(mapped[header_start:header_start + header_length])
+        data_start = _align(header_start + header_length)
+        if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotError(f"Snapshot format {header.get('format_version')} is not "
+                                f"{SNAPSHOT_FORMAT_VERSION}; rebuild it")
+
+        arrays = {
+            name: np.frombuffer(mapped, dtype=np.dtype(entry["dtype"]), count=entry["length"],
+                                offset=data_start + entry["offset"])
+            for name, entry in header["arrays"].items()
+        }
+        objects_start = data_start + header["objects"]["offset"]
+        objects = pickle.loads(mapped[objects_start:objects_start + header["objects"]["length"]])
+    except SnapshotError:
+        raise
+    except Exception as e:
+        raise SnapshotError(f"Corrupt snapshot {path}: {e}") from e
+
+    return header, objects, arrays
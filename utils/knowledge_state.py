@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from utils.answers import render_topic_answers
+from utils.kb_snapshot import SnapshotError, read_snapshot, write_snapshot
+from utils.multipattern import AhoCorasick
+from utils.process_local import ProcessLocal
+from utils.retrieval import RetrievalIndex
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_BASE_PATH = 'knowledge_base/brazilian_housing_laws.json'
+# Built with `flask build-kb-snapshot`; used instead of the JSON when it matches it
+KNOWLEDGE_BASE_SNAPSHOT_PATH = 'knowledge_base/brazilian_housing_laws.kbsnap'
+
+
+class KnowledgeBaseState(NamedTuple):
+    """
+    A loaded knowledge base together with everything derived from it.
+
+    Never modified after it is built: a reload builds a new state and replaces
+    the reference, so a request that read the old state finishes with it.
+    """
+    version: str
+    knowledge_base: Dict[str, Any]
+    index: RetrievalIndex
+    matcher: AhoCorasick
+    topic_answers: Dict[str, str]
+
+
+def load_knowledge_base(path: str = KNOWLEDGE_BASE_PATH) -> Dict[str, Any]:
+    """Load the knowledge base from the JSON file."""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        else:
+            logger.warning("Knowledge base file not found at %s", path)
+            return {}
+    except Exception as e:
+        logger.exception("Error loading knowledge base: %s", e)
+        return {}
+
+
+def _content_version(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def source_version(path: str = KNOWLEDGE_BASE_PATH) -> Optional[str]:
+    """Content hash identifying a knowledge base file, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            return _content_version(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def build_vocabulary_matcher(knowledge_base: Dict[str, Any]) -> AhoCorasick:
+    """
+    Build the multi-pattern matcher for the knowledge base vocabulary.
+
+    Topic keywords are added with kind "topic" and law citations with kind
+    "law", each keyed by the section they refer to, so that adding vocabulary
+    only means editing the knowledge base file.
+
+    Args:
+        knowledge_base: The parsed knowledge base JSON
+
+    Returns:
+        The compiled matcher
+    """
+    vocabulary = knowledge_base.get("vocabulary", {})
+    matcher = AhoCorasick()
+
+    for topic, keywords in vocabulary.get("topics", {}).items():
+        for keyword in keywords:
+            matcher.add(keyword, "topic", topic)
+
+    for law, reference in vocabulary.get("law_references", {}).items():
+        for pattern in reference.get("patterns", []):
+            matcher.add(pattern, "law", law)
+
+    return matcher.build()
+
+
+def build_state(knowledge_base: Dict[str, Any], version: str) -> KnowledgeBaseState:
+    """Derive the index, matcher and rendered answers from a parsed knowledge base."""
+    return KnowledgeBaseState(
+        version=version,
+        knowledge_base=knowledge_base,
+        index=RetrievalIndex.from_knowledge_base(knowledge_base),
+        matcher=build_vocabulary_matcher(knowledge_base),
+        topic_answers=render_topic_answers(knowledge_base),
+    )
+
+
+def save_snapshot(state: KnowledgeBaseState, path: str = KNOWLEDGE_BASE_SNAPSHOT_PATH) -> None:
+    """Write a state to a snapshot file that load_state can map instead of parsing the JSON."""
+    index = state.index
+    write_snapshot(
+        path,
+        state.version,
+        objects={
+            "knowledge_base": state.knowledge_base,
+            "passages": index.passages,
+            "vocabulary": index.vocabulary,
+            "bm25": {"k1": index.k1, "b": index.b},
+            "matcher": state.matcher,
+            "topic_answers": state.topic_answers,
+        },
+        arrays=index.to_arrays(),
+    )
+
+
+def load_snapshot(path: str = KNOWLEDGE_BASE_SNAPSHOT_PATH) -> KnowledgeBaseState:
+    """Load a state from a snapshot file; raises SnapshotError if it is unusable."""
+    header, objects, arrays = read_snapshot(path)
+    index = RetrievalIndex.from_arrays(
+        objects["passages"], objects["vocabulary"], arrays, **objects["bm25"]
+    )
+    return KnowledgeBaseState(
+        version=header["source_version"],
+        knowledge_base=objects["knowledge_base"],
+        index=index,
+        matcher=objects["matcher"],
+        topic_answers=objects["topic_answers"],
+    )
+
+
+def build_snapshot(json_path: str = KNOWLEDGE_BASE_PATH,
+                   snapshot_path: str = KNOWLEDGE_BASE_SNAPSHOT_PATH) -> KnowledgeBaseState:
+    """
+    Compile the JSON knowledge base into a snapshot file.
+
+    Returns:
+        The state written to the snapshot
+    """
+    state = build_state(load_knowledge_base(json_path), source_version(json_path) or "empty")
+    save_snapshot(state, snapshot_path)
+    return state
+
+
+def load_state(json_path: str = KNOWLEDGE_BASE_PATH,
+               snapshot_path: str = KNOWLEDGE_BASE_SNAPSHOT_PATH,
+               strict: bool = False) -> KnowledgeBaseState:
+    """
+    Load the knowledge base, from its snapshot when one matches the JSON file.
+
+    A snapshot built from a different version of the JSON, or in an older
+    format, is ignored and the JSON is parsed and indexed instead.
+
+    Args:
+        json_path: The knowledge base JSON file
+        snapshot_path: The snapshot compiled from it, if any
+        strict: Raise if the JSON is missing or invalid instead of loading an
+            empty knowledge base
+
+    Returns:
+        The loaded state
+    """
+    started = time.perf_counter()
+    # Hash and parse the same bytes, so the version always matches the content
+    try:
+        with open(json_path, 'rb') as file:
+            source = file.read()
+    except FileNotFoundError:
+        if strict:
+            raise
+        logger.warning("Knowledge base file not found at %s", json_path)
+        source = None
+    version = _content_version(source) if source is not None else None
+
+    if os.path.exists(snapshot_path):
+        try:
+            state = load_snapshot(snapshot_path)
+        except SnapshotError as e:
+            logger.warning("Ignoring knowledge base snapshot: %s", e)
+        else:
+            if version is None or state.version == version:
+                logger.info("Loaded knowledge base %s from snapshot in %.1f ms",
+                            state.version, (time.perf_counter() - started) * 1000)
+                return state
+            logger.warning("Knowledge base snapshot %s is stale (source is %s); loading the JSON",
+                           state.version, version)
+
+    knowledge_base: Dict[str, Any] = {}
+    if source is not None:
+        try:
+            knowledge_base = json.loads(source)
+        except ValueError as e:
+            if strict:
+                raise
+            logger.exception("Error loading knowledge base: %s", e)
+
+    state = build_state(knowledge_base, version or "empty")
+    logger.info("Loaded knowledge base %s from JSON in %.1f ms",
+                state.version, (time.perf_counter() - started) * 1000)
+    return state
+
+
+# The current state; replaced as a whole, never modified
+_state = load_state()
+
+# Callbacks run with the new state after every reload
+_reload_listeners: List[Callable[[KnowledgeBaseState], None]] = []
+_reload_lock = threading.Lock()
+
+
+def current() -> KnowledgeBaseState:
+    """Return the current knowledge base state; read it once per request and keep it."""
+    return _state
+
+
+def on_knowledge_base_reload(listener: Callable[[KnowledgeBaseState], None]) -> Callable[[KnowledgeBaseState], None]:
+    """Register a callback to run after the knowledge base is reloaded; usable as a decorator."""
+    _reload_listeners.append(listener)
+    return listener
+
+
+def reload_knowledge_base(force: bool = False) -> Optional[KnowledgeBaseState]:
+    """
+    Re-read the knowledge base and swap in a new state if the file has changed.
+
+    The new state is built completely before it replaces the current one, so
+    requests keep using the old version until then and finish on whichever
+    version they started with. If the file cannot be parsed the current state
+    is kept.
+
+    Args:
+        force: Rebuild even if the file's content hash matches the current version
+
+    Returns:
+        The new state, or None if nothing was reloaded
+    """
+    global _state
+
+    with _reload_lock:
+        if not force and source_version() == _state.version:
+            return None
+        try:
+            new_state = load_state(strict=True)
+        except (OSError, ValueError) as e:
+            logger.error("Keeping knowledge base %s; reload failed: %s", _state.version, e)
+            return None
+        old_version, _state = _state.version, new_state
+
+    for listener in _reload_listeners:
+        try:
+            listener(new_state)
+        except Exception:
+            logger.exception("Knowledge base reload listener %r failed", listener)
+
+    logger.info("Knowledge base reloaded: %s -> %s", old_version, new_state.version)
+    return new_state
+
+
+class KnowledgeBaseWatcher:
+    """
+    Background thread that reloads the knowledge base when its file changes.
+
+    The file's modification time, size and inode are checked every
+    ``interval`` seconds, and the content hash only when they change. Every
+    worker process runs its own watcher against the same file, so all workers
+    converge on the version on disk within one interval.
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_BASE_PATH, interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self._signature = None
+        self._thread = ProcessLocal(self._start_thread)
+
+    def ensure_started(self) -> None:
+        """Start the thread in the current process; a no-op when already running or disabled."""
+        if self.interval > 0:
+            self._thread.get()
+
+    def _start_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self._run, name="knowledge-base-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def check(self) -> Optional[KnowledgeBaseState]:
+        """Reload if the file changed since the last check; returns the new state, if any."""
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        return reload_knowledge_base()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Knowledge base watcher check failed")
+            time.sleep(self.interval)
@@ -0,0 +1,103 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class DebugSampler(logging.Filter):
+    """Pass a random ``rate`` fraction of DEBUG records; records above DEBUG always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a listener thread in the same process, leaving formatting to it.
+
+    QueueHandler.prepare runs the full formatter on the calling thread,
+    tracebacks included, so the record can be pickled. Records here never
+    leave the process, so only the message arguments are interpolated, since
+    they may be mutated after the call; the timestamp, format string and any
+    traceback are rendered by the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, debug_sample_rate: Optional[float] = None) -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Request threads only interpolate the message and put the record on an
+    in-memory queue; a QueueListener thread formats it, including any
+    traceback, and writes it to stderr. Calling this again replaces
+    the previous configuration.
+
+    Args:
+        level: Root log level name; defaults to the LOG_LEVEL environment
+            variable, or INFO
+        debug_sample_rate: Fraction of DEBUG records to keep; defaults to the
+            LOG_DEBUG_SAMPLE_RATE environment variable, or 1.0
+    """
+    global _listener
+
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    if debug_sample_rate < 1.0:
+        queue_handler.addFilter(DebugSampler(debug_sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    """Write out queued records before the process exits."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_in_child() -> None:
+    """The listener thread does not survive a fork, so start a new one in the child."""
+    global _listener
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(
+            _listener.queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_in_child)
@@ -0,0 +1,292 @@
+import bisect
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.process_local import ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+# File layout: an 8-byte header holding the number of bytes in use, then
+# entries of [u32 key length][key][padding to 8 bytes][f64 value]. Values are
+# 8-byte aligned so a reader never sees a torn float, and the header is
+# written after the entry so a reader never sees a partial one.
+_HEADER = struct.Struct("<Q")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_INITIAL_FILE_SIZE = 1 << 16
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _padded(length: int) -> int:
+    return length + (-length % 8)
+
+
+class _MmapedValues:
+    """Float values stored by key in a memory-mapped file written only by its owning process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._positions: Dict[str, int] = {}
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        for key, _, position in _read_entries(self._map, self._used):
+            self._positions[key] = position
+
+    def _position(self, key: str) -> int:
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+
+        encoded = key.encode("utf-8")
+        entry_size = _KEY_LENGTH.size + _padded(len(encoded)) + _VALUE.size
+        while self._used + entry_size > len(self._map):
+            self._grow()
+
+        start = self._used
+        _KEY_LENGTH.pack_into(self._map, start, len(encoded))
+        self._map[start + _KEY_LENGTH.size:start + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = start + _KEY_LENGTH.size + _padded(len(encoded))
+        _VALUE.pack_into(self._map, position, 0.0)
+        self._used = start + entry_size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def _grow(self) -> None:
+        size = len(self._map) * 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def add(self, key: str, amount: float) -> None:
+        position = self._position(key)
+        _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def set(self, key: str, value: float) -> None:
+        _VALUE.pack_into(self._map, self._position(key), value)
+
+
+def _read_entries(data, used: int) -> Iterator[Tuple[str, float, int]]:
+    """Yield (key, value, value position) for each entry in a values file."""
+    offset = _HEADER.size
+    while offset < used:
+        length = _KEY_LENGTH.unpack_from(data, offset)[0]
+        key_start = offset + _KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode("utf-8")
+        position = key_start + _padded(length)
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        offset = position + _VALUE.size
+
+
+def _read_file(path: str) -> List[Tuple[str, float]]:
+    """Read a values file without locking; another process may be appending to it."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return []
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _read_entries(data, used)]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def default_metrics_dir() -> str:
+    """
+    Directory for this server's values files.
+
+    Gunicorn workers share their master's PID as parent, so each deployment
+    gets a fresh directory and old workers' counters are not carried over.
+    """
+    return os.path.join(tempfile.gettempdir(), "brazil_law_metrics", str(os.getppid()))
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms shared by all worker processes.
+
+    Each process writes its samples to its own memory-mapped file in
+    ``directory``; a scrape reads every file and adds them up, so it never
+    contends with the request path. Counters and histograms include processes
+    that have exited, so totals do not drop when a worker is recycled. Gauges
+    only include live processes.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or default_metrics_dir()
+        self.metrics: List["_Metric"] = []
+        # Each process writes its own file; the parent's belongs to the parent
+        self._values = ProcessLocal(self._open_values)
+        self._lock = threading.Lock()
+
+    def _open_values(self) -> _MmapedValues:
+        os.makedirs(self.directory, exist_ok=True)
+        return _MmapedValues(os.path.join(self.directory, f"{os.getpid()}.db"))
+
+    def _file_values(self) -> _MmapedValues:
+        return self._values.get()
+
+    def _add(self, key: str, amount: float) -> None:
+        with self._lock:
+            self._file_values().add(key, amount)
+
+    def _set(self, key: str, value: float) -> None:
+        with self._lock:
+            self._file_values().set(key, value)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> "Counter":
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> "Gauge":
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+        """Sum the samples of every process, keyed by (sample name, labels)."""
+        totals: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        gauges = {metric.name for metric in self.metrics if metric.type == "gauge"}
+        for path in glob.glob(os.path.join(self.directory, "*.db")):
+            try:
+                pid = int(os.path.basename(path)[:-3])
+                alive = pid == os.getpid() or _process_alive(pid)
+                samples = _read_file(path)
+            except (OSError, ValueError):
+                logger.warning("Skipping unreadable metrics file %s", path)
+                continue
+            for key, value in samples:
+                metric_name, sample_name, labels = json.loads(key)
+                if metric_name in gauges and not alive:
+                    continue
+                totals[(sample_name, tuple(tuple(label) for label in labels))] += value
+        return totals
+
+    def exposition(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        totals = self.collect()
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(totals))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        name + '="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for name, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames: Iterable[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, labels: Dict[str, object]) -> List[List[str]]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return [[name, str(labels[name])] for name in self.labelnames]
+
+    def _key(self, sample_name: str, labels: List[List[str]]) -> str:
+        return json.dumps([self.name, sample_name, labels])
+
+    def _samples(self, totals, sample_name: str):
+        for (name, labels), value in sorted(totals.items()):
+            if name == sample_name:
+                yield labels, value
+
+    def render(self, totals) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+                for labels, value in self._samples(totals, self.name)]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry._add(self._key(self.name, self._labels(labels)), amount)
+
+
+class Gauge(_Metric):
+    """A gauge summed over live processes."""
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.registry._set(self._key(self.name, self._labels(labels)), value)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry._add(self._key(self.name, self._labels(labels)), amount)
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames, buckets: Tuple[float, ...]):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        label_list = self._labels(labels)
+        # Buckets are stored non-cumulatively and accumulated when rendered
+        upper = self.buckets[bisect.bisect_left(self.buckets, value)]
+        self.registry._add(self._key(f"{self.name}_bucket", label_list + [["le", _format_value(upper)]]), 1)
+        self.registry._add(self._key(f"{self.name}_sum", label_list), value)
+        self.registry._add(self._key(f"{self.name}_count", label_list), 1)
+
+    def render(self, totals) -> List[str]:
+        lines: List[str] = []
+        counts = dict(self._samples(totals, f"{self.name}_count"))
+        sums = dict(self._samples(totals, f"{self.name}_sum"))
+        buckets = dict(self._samples(totals, f"{self.name}_bucket"))
+        for labels, count in counts.items():
+            cumulative = 0.0
+            for upper in self.buckets:
+                le = _format_value(upper)
+                cumulative += buckets.get(labels + (("le", le),), 0.0)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(sums.get(labels, 0.0))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(count)}")
+        return lines
@@ -0,0 +1,99 @@
+from collections import deque
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class PatternMatch(NamedTuple):
+    """A vocabulary pattern found in a text."""
+    start: int
+    end: int
+    pattern: str
+    kind: str
+    key: str
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton that finds every occurrence of many patterns in one pass.
+
+    Patterns are tagged with a ``kind`` (for example "topic" or "law") and a
+    ``key`` naming what they refer to, and matching is case-insensitive. A match
+    must start at a word boundary, so "cdc" is not found inside "abcdc", but it
+    may run into a longer word, so "tenant" is still found in "tenants".
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[str, str, str]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, kind: str, key: str) -> None:
+        """
+        Add a pattern to the automaton.
+
+        Args:
+            pattern: The text to look for
+            kind: The category of the pattern
+            key: The identifier the pattern refers to within its category
+        """
+        pattern = pattern.lower()
+        if not pattern:
+            return
+
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((pattern, kind, key))
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        """Compute failure links; called automatically before the first search."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+        self._built = True
+        return self
+
+    def find_all(self, text: str) -> List[PatternMatch]:
+        """
+        Find every pattern occurrence in a text.
+
+        Args:
+            text: The text to search
+
+        Returns:
+            The matches ordered by end position
+        """
+        if not self._built:
+            self.build()
+
+        text = text.lower()
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern, kind, key in self._outputs[state]:
+                start = position - len(pattern) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    matches.append(PatternMatch(start, position + 1, pattern, kind, key))
+        return matches
@@ -1,31 +1,68 @@
 import re
-import json
 import logging
-import os
-from typing import List, Dict, Any
+from typing import Dict
+from utils import knowledge_state
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Load the knowledge base
-KNOWLEDGE_BASE_PATH = 'knowledge_base/brazilian_housing_laws.json'
-
-def load_knowledge_base() -> Dict[str, Any]:
-    """Load the knowledge base from the JSON file."""
-    try:
-        if os.path.exists(KNOWLEDGE_BASE_PATH):
-            with open(KNOWLEDGE_BASE_PATH, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        else:
-            logger.warning(f"Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
-            return {}
-    except Exception as e:
-        logger.exception(f"Error loading knowledge base: {str(e)}")
-        return {}
-
-# Load knowledge base at module import time
-knowledge_base = load_knowledge_base()
+# Normalize common terms related to Brazilian housing law
+TERM_MAPPINGS = {
+    "apartment": "property",
+    "flat": "property",
+    "house": "property",
+    "apt": "property",
+    "landlord": "landlord",
+    "proprietário": "landlord",
+    "dono": "landlord",
+    "renter": "tenant",
+    "inquilino": "tenant",
+    "locatário": "tenant",
+    "contract": "rental contract",
+    "contrato": "rental contract",
+    "deposit": "security deposit",
+    "caução": "security deposit",
+    "guarantor": "fiador",
+    "garantidor": "fiador"
+}
+
+# Expand common acronyms and Brazilian-specific terms
+ACRONYM_MAPPINGS = {
+    "iptu": "Imposto Predial e Territorial Urbano (property tax)",
+    "igpm": "Índice Geral de Preços do Mercado (market price index)",
+    "ipca": "Índice Nacional de Preços ao Consumidor Amplo (consumer price index)"
+}
+
+def _compile_normalizer(mappings: Dict[str, str]) -> "re.Pattern[str]":
+    """
+    Compile every mapping key into one whole-word alternation pattern.
+
+    Longer keys are tried first so that a key which is a prefix of another
+    can never shadow it.
+    """
+    alternation = "|".join(re.escape(term) for term in sorted(mappings, key=len, reverse=True))
+    return re.compile(r'\b(?:' + alternation + r')\b')
+
+NORMALIZATION_MAPPINGS = {**TERM_MAPPINGS, **ACRONYM_MAPPINGS}
+NORMALIZATION_PATTERN = _compile_normalizer(NORMALIZATION_MAPPINGS)
+
+def normalize_terms(text: str) -> str:
+    """
+    Apply TERM_MAPPINGS and ACRONYM_MAPPINGS to lowercased text in one pass.
+
+    No replacement contains a key that is applied after it, so one scan gives
+    the same result as substituting each mapping in turn.
+
+    Args:
+        text: The lowercased query text
+
+    Returns:
+        The text with every mapped term replaced
+    """
+    return NORMALIZATION_PATTERN.sub(lambda match: NORMALIZATION_MAPPINGS[match.group(0)], text)
+
+# Text preprocess_query adds around the user's words
+SHORT_QUERY_CONTEXT = "In the context of Brazilian housing laws and tenant rights, "
+CITATION_REMINDER = ". Please cite specific Brazilian laws and articles when applicable."
 
 def preprocess_query(query: str) -> str:
     """
@@ -40,63 +77,47 @@ def preprocess_query(query: str) -> str:
     # Convert to lowercase
     processed = query.lower()
     
-    # Normalize common terms related to Brazilian housing law
-    term_mappings = {
-        "apartment": "property",
-        "flat": "property",
-        "house": "property",
-        "apt": "property",
-        "landlord": "landlord",
-        "proprietário": "landlord",
-        "dono": "landlord",
-        "renter": "tenant", 
-        "inquilino": "tenant",
-        "locatário": "tenant",
-        "contract": "rental contract",
-        "contrato": "rental contract",
-        "deposit": "security deposit",
-        "caução": "security deposit",
-        "guarantor": "fiador",
-        "garantidor": "fiador"
-    }
-    
-    for term, replacement in term_mappings.items():
-        processed = re.sub(r'\b' + term + r'\b', replacement, processed)
-    
-    # Expand common acronyms and Brazilian-specific terms
-    acronym_mappings = {
-        "iptu": "Imposto Predial e Territorial Urbano (property tax)",
-        "igpm": "Índice Geral de Preços do Mercado (market price index)",
-        "ipca": "Índice Nacional de Preços ao Consumidor Amplo (consumer price index)"
-    }
-    
-    for acronym, expansion in acronym_mappings.items():
-        processed = re.sub(r'\b' + acronym + r'\b', expansion, processed)
+    # Normalize common terms and expand acronyms in a single scan
+    processed = normalize_terms(processed)
     
     # Add context to the query if it's very short
     if len(processed.split()) < 3:
-        processed = f"In the context of Brazilian housing laws and tenant rights, {processed}"
-    
-    # Check for specific law references
-    law_references = [
-        "lei do inquilinato", "lei 8245", "lei nº 8.245", 
-        "codigo civil", "código civil", "lei 10406",
-        "cdc", "codigo de defesa do consumidor"
-    ]
+        processed = SHORT_QUERY_CONTEXT + processed
     
-    for law in law_references:
-        if law in processed:
-            # If a specific law is mentioned, note that in the query
-            if "lei do inquilinato" in processed or "lei 8245" in processed or "lei nº 8.245" in processed:
-                processed += " according to the Lei do Inquilinato (Lei nº 8.245/91), the main Brazilian rental law"
-            elif "codigo civil" in processed or "código civil" in processed or "lei 10406" in processed:
-                processed += " according to the Brazilian Civil Code (Código Civil)"
-            elif "cdc" in processed or "codigo de defesa do consumidor" in processed:
-                processed += " according to the Brazilian Consumer Protection Code"
+    # Check for specific law references; the first law listed in the knowledge
+    # base that is mentioned anywhere in the query provides the context
+    state = knowledge_state.current()
+    mentioned_laws = {match.key for match in state.matcher.find_all(processed) if match.kind == "law"}
+    for law, reference in state.knowledge_base.get("vocabulary", {}).get("law_references", {}).items():
+        if law in mentioned_laws:
+            processed += " " + reference.get("context", "")
             break
     
     # Enhance query with a reminder to cite Brazilian laws
-    processed += ". Please cite specific Brazilian laws and articles when applicable."
+    processed += CITATION_REMINDER
     
-    logger.debug(f"Preprocessed query: {processed}")
+    logger.debug("Preprocessed query: %s", processed)
+    return processed
+
+def strip_query_context(processed: str) -> str:
+    """
+    Remove the text preprocess_query added, leaving the user's normalized words.
+
+    Used to replay stored queries, which are saved in their preprocessed form.
+
+    Args:
+        processed: A query returned by preprocess_query
+
+    Returns:
+        The lowercased, normalized query without the added context
+    """
+    if processed.endswith(CITATION_REMINDER):
+        processed = processed[:-len(CITATION_REMINDER)]
+    for reference in knowledge_state.current().knowledge_base.get("vocabulary", {}).get("law_references", {}).values():
+        context = " " + reference.get("context", "")
+        if context.strip() and processed.endswith(context):
+            processed = processed[:-len(context)]
+            break
+    if processed.startswith(SHORT_QUERY_CONTEXT):
+        processed = processed[len(SHORT_QUERY_CONTEXT):]
     return processed
@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Encode the (timestamp, id) position of the last row on a page.
+
+    Args:
+        timestamp: The row's timestamp
+        row_id: The row's primary key, which breaks ties between equal timestamps
+
+    Returns:
+        An opaque, URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        The (timestamp, id) pair, or None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def parse_page_size(value: Optional[str], default: int, maximum: int) -> int:
+    """Parse a page size request parameter, clamped to 1..maximum."""
+    try:
+        size = int(value) if value else default
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
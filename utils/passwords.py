@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from utils.process_local import ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+# scrypt work factors considered during calibration. The floor is Werkzeug's
+# default, so calibration never weakens hashes; the ceiling bounds memory use
+# at 128 * n * r bytes per hash (128 MiB for n = 2**17, r = 8).
+MIN_SCRYPT_N = 2 ** 15
+MAX_SCRYPT_N = 2 ** 17
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Work factor timed to estimate the cost per unit of n
+_CALIBRATION_N = 2 ** 14
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when a hash could not be scheduled within the queue timeout."""
+
+
+def calibrate_scrypt_n(target_seconds: float) -> int:
+    """
+    Choose the scrypt work factor whose hashing time is closest to, without exceeding, a target.
+
+    The cost of scrypt is linear in n, so a single timing at a small n is
+    extrapolated. The result is a power of two between MIN_SCRYPT_N and
+    MAX_SCRYPT_N.
+
+    Args:
+        target_seconds: Desired time to hash one password on this machine
+
+    Returns:
+        The scrypt n parameter
+    """
+    method = f"scrypt:{_CALIBRATION_N}:{SCRYPT_R}:{SCRYPT_P}"
+    start = time.perf_counter()
+    generate_password_hash("calibration", method=method)
+    seconds_per_n = (time.perf_counter() - start) / _CALIBRATION_N
+
+    n = MIN_SCRYPT_N
+    while n * 2 <= MAX_SCRYPT_N and n * 2 * seconds_per_n <= target_seconds:
+        n *= 2
+    logger.info("Calibrated password hashing to scrypt n=%d (~%.0f ms per hash, target %.0f ms)",
+                n, n * seconds_per_n * 1000, target_seconds * 1000)
+    return n
+
+
+def _parse_method(password_hash: str) -> Optional[tuple]:
+    """Split a Werkzeug hash into its method name and integer parameters."""
+    method, _, _ = password_hash.partition("$")
+    name, *params = method.split(":")
+    if name == "scrypt":
+        try:
+            n, r, p = (map(int, params) if params else (2 ** 15, 8, 1))
+        except ValueError:
+            return None
+        return name, n, r, p
+    return (name,)
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a small bounded thread pool.
+
+    The calling request thread waits for its hash, so this only pays off when
+    a worker process serves several requests at once: the app is deployed on
+    gunicorn's gthread worker class (see .replit). There, hashlib's scrypt
+    releases the GIL, so hashes run alongside the other request threads, while
+    ``max_workers`` caps how many cores (and how much scrypt memory) a login
+    surge can take from each worker process. At most ``max_pending`` hashes
+    may be queued or running; callers beyond that wait up to ``queue_timeout``
+    seconds and then get PasswordHasherBusy, so a surge is shed instead of
+    tying up every request thread behind the pool. ``max_pending`` must be
+    lower than the worker's thread count to ever take effect, and under the
+    sync worker class, with one request per process, none of this applies.
+    The pool is created lazily in each process, so the hasher is safe to
+    build before a fork.
+    """
+
+    def __init__(self, n: int = MIN_SCRYPT_N, max_workers: int = 2, max_pending: int = 4,
+                 queue_timeout: float = 2.0):
+        self.method = f"scrypt:{n}:{SCRYPT_R}:{SCRYPT_P}"
+        self.n = n
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = ProcessLocal(
+            lambda: ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+        )
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            return self._pool.get().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the calibrated parameters."""
+        result = self._run(generate_password_hash, password, self.method)
+        self.hashed += 1
+        return result
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Check a password against a stored hash of any supported method."""
+        result = self._run(check_password_hash, password_hash, password)
+        self.verified += 1
+        return result
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when a stored hash uses another method or weaker parameters than the current ones."""
+        parsed = _parse_method(password_hash)
+        if parsed is None or parsed[0] != "scrypt":
+            return True
+        _, n, r, p = parsed
+        return n < self.n or r < SCRYPT_R or p < SCRYPT_P
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "max_workers": self.max_workers,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
@@ -1,22 +1,275 @@
 import json
 import logging
-from typing import Dict, List, Any
+import random
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
 from utils.local_knowledge_base import get_response_from_knowledge_base
+from utils.process_local import ProcessLocal
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def get_chat_response(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+DEFAULT_API_URL = "https://api.perplexity.ai/chat/completions"
+
+# Responses with these statuses are retried; other errors fail at once
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RemoteBackendError(Exception):
+    """Raised when the remote answer backend fails or its circuit is open."""
+
+
+def _check_completion(data: Any) -> Dict[str, Any]:
     """
-    Get a response for the chat messages using the local knowledge base.
+    Check that a response body holds an answer.
+
+    Raises:
+        RemoteBackendError: If there is no non-empty message content, or the
+            citations are not a list
+    """
+    try:
+        content = data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise RemoteBackendError("Remote backend response has no answer") from None
+    if not isinstance(content, str) or not content.strip():
+        raise RemoteBackendError("Remote backend returned an empty answer")
+    if not isinstance(data.get("citations", []), list):
+        raise RemoteBackendError("Remote backend returned malformed citations")
+    return data
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds. Then a single trial call
+    is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                    logger.warning("Remote answer backend circuit opened after %d failures", self._failures)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class RemoteChatBackend:
+    """
+    Client for an OpenAI-style chat completions API such as Perplexity's.
+
+    Requests go through one pooled keep-alive session per process, so TCP and
+    TLS handshakes are paid once per connection rather than once per
+    question. Connection errors, timeouts and retryable statuses are retried
+    up to ``max_retries`` times with full-jitter exponential backoff; the
+    circuit breaker counts a call as failed only once its retries are spent.
+
+    ``deadline`` bounds a whole call, retries and backoff included: each
+    attempt's timeouts are cut to the time left, and no retry starts once the
+    backoff would reach it. The read timeout limits each wait for data rather
+    than the whole body, so a server trickling bytes can still overrun it.
+    """
+
+    def __init__(self, url: str = DEFAULT_API_URL, api_key: Optional[str] = None, model: str = "sonar",
+                 connect_timeout: float = 2.0, read_timeout: float = 8.0, deadline: float = 12.0, max_retries: int = 2,
+                 backoff_base: float = 0.2, backoff_max: float = 2.0, pool_size: int = 10,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        # Connections must not be shared with the parent after a fork
+        self._session = ProcessLocal(self._new_session)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if self.api_key:
+            session.headers["Authorization"] = f"Bearer {self.api_key}"
+        return session
+
+    def _get_session(self) -> requests.Session:
+        return self._session.get()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def complete(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Send the messages to the remote backend.
+
+        Returns:
+            The response body, with a non-empty answer in "choices" and, when
+            present, a list of "citations"
+
+        Raises:
+            RemoteBackendError: If the circuit is open, the call failed after its
+                retries or within its deadline, or the body holds no answer
+        """
+        if not self.breaker.allow():
+            raise RemoteBackendError("Circuit open")
+
+        self.calls += 1
+        succeeded = False
+        try:
+            # A body without an answer counts as a failure, not a success; it is not retried
+            data = _check_completion(self._post_with_retries({"model": self.model, "messages": messages}))
+            succeeded = True
+            return data
+        finally:
+            # Settle the breaker whatever was raised, or a half-open trial would never end
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.failures += 1
+                self.breaker.record_failure()
+
+    def _post_with_retries(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            try:
+                response = self._get_session().post(self.url, json=payload, timeout=timeout)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = RemoteBackendError(f"Remote backend returned {response.status_code}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = RemoteBackendError(f"Remote backend unreachable: {e}")
+            except (requests.RequestException, ValueError) as e:
+                # Other client errors and malformed bodies will not improve on retry
+                raise RemoteBackendError(f"Remote backend request failed: {e}") from e
+
+            backoff = self._backoff(attempt)
+            out_of_time = time.monotonic() + backoff >= deadline
+            if attempt >= self.max_retries or out_of_time:
+                if attempt < self.max_retries:
+                    self.deadline_exceeded += 1
+                raise error
+            time.sleep(backoff)
+            attempt += 1
+            self.retries += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "circuit": self.breaker.stats(),
+        }
+
+
+# Set by configure_remote_backend; None answers from the local knowledge base only
+remote_backend: Optional[RemoteChatBackend] = None
+
+
+def configure_remote_backend(backend: Optional[RemoteChatBackend]) -> None:
+    """Answer through ``backend``, falling back to the local knowledge base; None disables it."""
+    global remote_backend
+    remote_backend = backend
+
+
+def remote_backend_stats() -> Dict[str, Any]:
+    """Return the remote backend's counters, or mark it disabled."""
+    backend = remote_backend
+    if backend is None:
+        return {"enabled": False}
+    return {"enabled": True, **backend.stats()}
+
+
+def get_chat_response(messages: List[Dict[str, str]], allow_remote: bool = True) -> Dict[str, Any]:
+    """
+    Get a response for the chat messages.
+
+    The remote backend is used when one is configured; if it fails or its
+    circuit is open, the local knowledge base answers instead and the response
+    is marked with ``"fallback": True``.
     
     Args:
         messages: A list of message dictionaries with 'role' and 'content' keys.
+        allow_remote: False answers from the local knowledge base even when a
+            remote backend is configured
         
     Returns:
         A dictionary containing the response and citations.
     """
+    backend = remote_backend
+    if backend is not None and allow_remote:
+        try:
+            return backend.complete(messages)
+        except RemoteBackendError as e:
+            logger.warning("Falling back to the local knowledge base: %s", e)
+            response_data = _get_local_response(messages)
+            return {**response_data, "fallback": True}
+    return _get_local_response(messages)
+
+
+def _get_local_response(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Answer the last user message from the local knowledge base."""
     try:
         # Extract the user's query (the last user message)
         user_query = ""
@@ -37,16 +290,16 @@ def get_chat_response(messages: List[Dict[str, str]]) -> Dict[str, Any]:
                 "citations": []
             }
         
-        logger.debug(f"Processing query: {user_query}")
+        logger.debug("Processing query: %s", user_query)
         
         # Use our local knowledge base to get a response
         response_data = get_response_from_knowledge_base(user_query)
-        logger.debug(f"Generated response from local knowledge base")
+        logger.debug("Generated response from local knowledge base")
         
         return response_data
         
     except Exception as e:
-        logger.exception(f"Error in get_chat_response: {str(e)}")
+        logger.exception("Error in get_chat_response: %s", e)
         return {
             "choices": [
                 {
@@ -0,0 +1,42 @@
+import os
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ProcessLocal(Generic[T]):
+    """
+    A value created on first use in each process.
+
+    Threads do not survive a fork, and pools, sockets and mapped files
+    inherited from the parent still belong to it, so objects built before
+    gunicorn forks its workers keep such resources here: each worker creates
+    its own on first use, and the parent's are never touched.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._owner_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Return this process's value, creating it if needed."""
+        if self._owner_pid == os.getpid():
+            return self._value
+        with self._lock:
+            if self._owner_pid != os.getpid():
+                self._value = self._factory()
+                self._owner_pid = os.getpid()
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """Return this process's value without creating it, or None."""
+        return self._value if self._owner_pid == os.getpid() else None
+
+    def reset(self) -> None:
+        """Forget the value, so the next get() creates a new one."""
+        with self._lock:
+            self._value = None
+            self._owner_pid = None
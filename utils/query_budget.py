@@ -0,0 +1,97 @@
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Values for the mode argument of install_statement_budget
+BUDGET_MODES = ("off", "warn", "raise")
+
+
+class StatementBudgetExceeded(RuntimeError):
+    """Raised in "raise" mode when a request runs more SQL statements than its budget."""
+
+
+class StatementCounter:
+    """SQL statements seen while a count_statements() block was active."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def statement_budget(limit: int) -> Callable:
+    """
+    Set the maximum number of SQL statements a view may run per request.
+
+    Apply directly below the route decorator. Views without a budget use the
+    default passed to install_statement_budget.
+    """
+    def decorator(view: Callable) -> Callable:
+        view.sql_statement_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def count_statements(engine) -> Iterator[StatementCounter]:
+    """
+    Count the SQL statements executed on an engine inside a with-block.
+
+    Example:
+        with count_statements(db.engine) as counter:
+            client.get('/admin')
+        assert counter.count <= 5
+    """
+    counter = StatementCounter()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+def install_statement_budget(app, engine, mode: str = "off", default_limit: Optional[int] = None) -> None:
+    """
+    Count SQL statements per request and enforce each view's budget.
+
+    Args:
+        app: The Flask application
+        engine: The engine whose statements are counted
+        mode: "off" to do nothing, "warn" to log requests over budget, or
+            "raise" to fail them with StatementBudgetExceeded
+        default_limit: Budget for views without statement_budget(); None means unlimited
+    """
+    if mode not in BUDGET_MODES:
+        raise ValueError(f"Unknown statement budget mode: {mode}")
+    if mode == "off":
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.sql_statements = g.get("sql_statements", 0) + 1
+
+    @app.after_request
+    def _check_statement_budget(response):
+        view = app.view_functions.get(request.endpoint)
+        limit = getattr(view, "sql_statement_budget", default_limit)
+        count = g.get("sql_statements", 0)
+        if limit is None or count <= limit:
+            return response
+
+        message = f"{request.method} {request.path} ran {count} SQL statements (budget {limit})"
+        if mode == "raise":
+            raise StatementBudgetExceeded(message)
+        logger.warning(message)
+        return response
@@ -0,0 +1,95 @@
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Statement builders for the application's hot queries, keyed by name
+HOT_QUERIES: Dict[str, Callable] = {}
+# Index each hot query was designed around, for those registered with one
+EXPECTED_INDEXES: Dict[str, str] = {}
+
+# Plan lines that mean a table is read in full or re-sorted on every execution
+_SQLITE_PROBLEMS = [
+    (re.compile(r"^SCAN (?!.*\bUSING\b)(\w+)"), "sequential scan"),
+    (re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)"), "sort without index"),
+]
+_POSTGRESQL_PROBLEMS = [
+    (re.compile(r"Seq Scan on (\w+)"), "sequential scan"),
+]
+
+
+def hot_query(name: str, index: Optional[str] = None) -> Callable:
+    """
+    Register a function that builds one of the app's hot queries.
+
+    The function is called without arguments and must return a SQLAlchemy
+    statement; used as a decorator. When ``index`` is given, the plan must
+    use that index: an ordered scan of some other index is no full-table
+    scan, but still reads every row.
+    """
+    def decorator(builder: Callable) -> Callable:
+        HOT_QUERIES[name] = builder
+        if index is not None:
+            EXPECTED_INDEXES[name] = index
+        return builder
+    return decorator
+
+
+def explain(session, statement) -> List[str]:
+    """
+    Return the database's query plan for a statement, one line per plan node.
+
+    Supports SQLite (EXPLAIN QUERY PLAN) and PostgreSQL (EXPLAIN).
+    """
+    dialect = session.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect.name == "sqlite":
+        return [row[-1] for row in session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    if dialect.name == "postgresql":
+        return [row[0] for row in session.execute(text("EXPLAIN " + sql))]
+    raise NotImplementedError(f"Query plan checks are not supported for {dialect.name}")
+
+
+def check_query_plans(session) -> Dict[str, List[str]]:
+    """
+    EXPLAIN every registered hot query and flag plans that do not use an index, or not the expected one.
+
+    On PostgreSQL, sequential scans are disabled for the check so that the
+    planner's choice reflects the available indexes rather than the size of a
+    small development table.
+
+    Returns:
+        The problems found, keyed by query name; empty when every plan is indexed
+    """
+    dialect = session.get_bind().dialect.name
+    problems_by_pattern = _SQLITE_PROBLEMS if dialect == "sqlite" else _POSTGRESQL_PROBLEMS
+
+    findings: Dict[str, List[str]] = {}
+    try:
+        if dialect == "postgresql":
+            session.execute(text("SET LOCAL enable_seqscan = off"))
+
+        for name, builder in HOT_QUERIES.items():
+            plan = explain(session, builder())
+            problems = []
+            for line in plan:
+                for pattern, description in problems_by_pattern:
+                    if pattern.search(line.strip()):
+                        problems.append(f"{description}: {line.strip()}")
+            expected = EXPECTED_INDEXES.get(name)
+            if expected is not None and not any(re.search(rf"\b{re.escape(expected)}\b", line) for line in plan):
+                problems.append(f"missing index: {expected} is not used ({' | '.join(plan)})")
+            if problems:
+                findings[name] = problems
+                for problem in problems:
+                    logger.warning("Query plan for '%s' has a %s", name, problem)
+            else:
+                logger.debug("Query plan for '%s': %s", name, " | ".join(plan))
+    finally:
+        session.rollback()
+
+    return findings
@@ -0,0 +1,306 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from flask import make_response
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(NamedTuple):
+    """A token bucket refilled at ``rate`` tokens per second, holding at most ``burst``."""
+    rate: float
+    burst: float
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in a dict local to the worker process.
+
+    Buckets that have refilled completely carry no state worth keeping, so they
+    are swept every ``sweep_interval`` seconds; beyond ``max_keys`` buckets the
+    least recently used are dropped.
+    """
+
+    def __init__(self, max_keys: int = 100000, sweep_interval: float = 60):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        # key -> (tokens, last_update, full_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def take(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Take ``cost`` tokens from a bucket, or none if it holds fewer.
+
+        Returns:
+            An (allowed, retry_after) tuple; retry_after is the number of
+            seconds until enough tokens are available when the request is refused
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+            tokens, last, _ = self._buckets.get(key, (limit.burst, now, now))
+            tokens = min(limit.burst, tokens + (now - last) * limit.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (limit.burst - tokens) / limit.rate)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+    def _sweep(self, now: float) -> None:
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a local SQLite file, shared by every worker process on the host.
+
+    Each take() is one short IMMEDIATE transaction, so concurrent workers see a
+    consistent bucket. Suitable for a single machine; a multi-host deployment
+    needs a network store behind the same take() interface.
+    """
+
+    def __init__(self, path: str, sweep_interval: float = 60):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._next_sweep = time.time() + sweep_interval
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """Take ``cost`` tokens from a bucket; see MemoryBucketStore.take."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_bucket WHERE key = ?", (key,)).fetchone()
+            tokens, last = row if row else (limit.burst, now)
+            tokens = min(limit.burst, tokens + max(0.0, now - last) * limit.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO rate_limit_bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, now + (limit.burst - tokens) / limit.rate),
+            )
+            if now >= self._next_sweep:
+                conn.execute("DELETE FROM rate_limit_bucket WHERE full_at <= ?", (now,))
+                self._next_sweep = now + self.sweep_interval
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+
+def create_bucket_store(url: str):
+    """
+    Build a bucket store from a RATE_LIMIT_STORE setting.
+
+    Args:
+        url: "memory" for a per-process store, or "sqlite:///<path>" for a
+            store shared by the workers on this host
+    """
+    if url == "memory":
+        return MemoryBucketStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteBucketStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unknown rate limit store: {url}")
+
+
+class RateLimiter:
+    """
+    Named token-bucket limits applied to routes with the limit() decorator.
+
+    A request over its limit is refused immediately with 429 and a Retry-After
+    header. If the store fails, requests are allowed rather than refused.
+    """
+
+    def __init__(self, store, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+        self.limits: Dict[str, RateLimit] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add_limit(self, name: str, per_minute: float, burst: float) -> None:
+        """Define a limit of ``per_minute`` requests with bursts of up to ``burst``."""
+        self.limits[name] = RateLimit(rate=per_minute / 60.0, burst=burst)
+        self._counts[name] = {"allowed": 0, "limited": 0, "errors": 0}
+
+    def check(self, name: str, key: str, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Count a request by ``key`` against the named limit.
+
+        Args:
+            name: A limit defined with add_limit
+            key: The client key
+            cost: Tokens the request uses, for requests that do the work of several
+
+        Returns:
+            An (allowed, retry_after) tuple
+        """
+        try:
+            allowed, retry_after = self.store.take(f"{name}:{key}", self.limits[name], cost)
+        except Exception:
+            logger.exception("Rate limit store failed for %s; allowing the request", name)
+            self._count(name, "errors")
+            return True, 0.0
+        self._count(name, "allowed" if allowed else "limited")
+        return allowed, retry_after
+
+    def _count(self, name: str, outcome: str) -> None:
+        with self._lock:
+            self._counts[name][outcome] += 1
+
+    def limit(self, name: str, key_func: Callable[[], Optional[str]]) -> Callable:
+        """
+        Decorator that applies the named limit to a view.
+
+        Args:
+            name: A limit defined with add_limit
+            key_func: Returns the client key for the current request, or None
+                to exempt the request
+        """
+        def decorator(view: Callable) -> Callable:
+            @wraps(view)
+            def limited_view(*args, **kwargs):
+                key = key_func() if self.enabled else None
+                if key is not None:
+                    self.enforce(name, key)
+                return view(*args, **kwargs)
+            return limited_view
+        return decorator
+
+    def enforce(self, name: str, key: str, cost: float = 1) -> None:
+        """
+        Check a limit from inside a view, for requests whose cost is only known there.
+
+        Raises:
+            TooManyRequests: If the client is over the limit
+        """
+        if not self.enabled:
+            return
+        allowed, retry_after = self.check(name, key, cost)
+        if not allowed:
+            raise TooManyRequests(
+                "Too many requests; please slow down and retry shortly.",
+                retry_after=math.ceil(retry_after),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "limits": {
+                    name: {"per_minute": limit.rate * 60, "burst": limit.burst, **self._counts[name]}
+                    for name, limit in self.limits.items()
+                },
+            }
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of requests a worker process handles at once.
+
+    The count is local to the process, so size ``max_concurrent`` per worker:
+    it only has an effect with threaded workers, and then only when it is
+    lower than the worker's thread count, which leaves the remaining threads
+    for requests outside the cap. Under sync workers each process serves one
+    request at a time and the cap never fires.
+
+    Requests beyond ``max_concurrent`` are refused with 503 straight away rather
+    than queued behind slow ones. The slot is held until the response has been
+    sent, so streamed responses count for their whole duration. A
+    ``max_concurrent`` of 0 disables the cap. ``in_flight_gauge``, if given, is
+    a metrics gauge kept equal to the number of requests in flight.
+    """
+
+    def __init__(self, max_concurrent: int, in_flight_gauge=None):
+        self.max_concurrent = max_concurrent
+        self.in_flight_gauge = in_flight_gauge
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.in_flight)
+        if self.in_flight_gauge is not None:
+            self.in_flight_gauge.inc()
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        if self.in_flight_gauge is not None:
+            self.in_flight_gauge.dec()
+
+    def limit(self, view: Callable) -> Callable:
+        """Decorator that admits a view's requests through the cap."""
+        @wraps(view)
+        def admitted_view(*args, **kwargs):
+            if not self.try_acquire():
+                raise ServiceUnavailable("The server is busy; please retry shortly.", retry_after=1)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                self.release()
+                raise
+            response.call_on_close(self.release)
+            return response
+        return admitted_view
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self.in_flight,
+                "peak": self.peak,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe mapping that evicts the least recently used entry.
+
+    Hit, miss and eviction counters are kept so the cache's effectiveness can be
+    monitored. A ``maxsize`` of 0 disables caching entirely.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Return the cached value for ``key``, or None on a miss."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        """Store ``value`` under ``key``, evicting the oldest entry when full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache size and its hit, miss and eviction counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def normalize_query(message: str) -> str:
+    """Lowercase a raw chat message and collapse its whitespace."""
+    return " ".join(message.lower().split())
+
+
+def history_fingerprint(history: List[str], turns: int) -> str:
+    """
+    Hash the last ``turns`` entries of a chat history.
+
+    Args:
+        history: The alternating user/assistant messages sent by the client
+        turns: How many of the most recent entries affect the answer
+
+    Returns:
+        A short hex digest; identical for histories that end the same way
+    """
+    relevant = history[-turns:] if turns > 0 else []
+    payload = json.dumps(relevant, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(message: str, history: List[str], turns: int, version: str = "") -> Tuple[str, str, str]:
+    """
+    Build the response cache key for a chat message and its history.
+
+    Including the knowledge base version means answers rendered from an older
+    version are never served once a new one is loaded, even if they were
+    stored after the reload.
+    """
+    return version, normalize_query(message), history_fingerprint(history, turns)
@@ -0,0 +1,236 @@
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Any, NamedTuple, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Top-level knowledge base sections that hold metadata rather than legal content
+NON_CONTENT_SECTIONS = {"vocabulary"}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+LIST_INDEX_PATTERN = re.compile(r"\[\d+\]")
+
+# Function words (English and Portuguese) that carry no retrieval signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "has", "have", "how", "i", "if", "in", "into", "is", "it", "its", "me",
+    "my", "of", "on", "or", "so", "that", "the", "their", "there", "this", "to",
+    "what", "when", "where", "which", "who", "why", "will", "with", "you", "your",
+    "o", "os", "um", "uma", "de", "do", "da", "dos", "das", "e", "em", "no",
+    "na", "nos", "nas", "por", "para", "com", "que", "se", "meu", "minha",
+    # Terms that preprocess_query appends to every query
+    "please", "cite", "specific", "applicable", "brazilian", "law", "article",
+}
+
+
+class Passage(NamedTuple):
+    """A single retrievable unit of knowledge base text."""
+    id: int
+    topic: str
+    path: str
+    text: str
+
+
+class SearchHit(NamedTuple):
+    """A passage together with its relevance score for a query."""
+    passage: Passage
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized index terms.
+
+    Terms are lowercased, stripped of accents, filtered against STOPWORDS and
+    reduced to their singular form with a light plural-stripping rule, so that
+    "direitos" and "direito" or "rights" and "right" share a posting list.
+
+    Args:
+        text: Raw query or passage text
+
+    Returns:
+        The list of terms in order of appearance
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+    tokens = []
+    for token in TOKEN_PATTERN.findall(normalized):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+            if token in STOPWORDS:
+                continue
+        tokens.append(token)
+    return tokens
+
+
+def flatten_knowledge_base(knowledge_base: Dict[str, Any]) -> List[Passage]:
+    """
+    Flatten the nested knowledge base into a list of passages.
+
+    Every string leaf becomes one passage, tagged with the top-level topic it
+    belongs to and the dotted path of keys that leads to it. The "vocabulary"
+    section is matched separately and is not indexed.
+
+    Args:
+        knowledge_base: The parsed knowledge base JSON
+
+    Returns:
+        The passages in document order
+    """
+    passages: List[Passage] = []
+
+    def walk(topic: str, path: str, node: Any) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                walk(topic, f"{path}.{key}", value)
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                walk(topic, f"{path}[{i}]", value)
+        elif isinstance(node, str):
+            passages.append(Passage(len(passages), topic, path, node))
+
+    for topic, content in knowledge_base.items():
+        if topic not in NON_CONTENT_SECTIONS:
+            walk(topic, topic, content)
+
+    return passages
+
+
+class RetrievalIndex:
+    """
+    Inverted index over knowledge base passages, ranked with Okapi BM25.
+
+    Posting lists are stored in compressed sparse row form: the postings of term
+    ``t`` are ``posting_docs[term_offsets[t]:term_offsets[t + 1]]`` with the
+    matching term frequencies in ``posting_tfs``. Scoring a query gathers the
+    posting slices of its own terms and scatters their BM25 weights into a
+    corpus-wide score vector in one vectorized pass, so the work grows with the
+    postings of the query terms rather than with the size of the knowledge base.
+    """
+
+    def __init__(self, passages: List[Passage], k1: float = 1.2, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for passage in passages:
+            # Path keys such as "rent_adjustments" are searchable as well
+            path_text = LIST_INDEX_PATTERN.sub("", passage.path).replace("_", " ")
+            terms = tokenize(passage.text) + tokenize(path_text)
+            counts: Dict[str, int] = defaultdict(int)
+            for term in terms:
+                counts[term] += 1
+            for term, tf in counts.items():
+                postings[term].append((passage.id, tf))
+            doc_lengths.append(len(terms))
+
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(postings)}
+        posting_lengths = np.fromiter((len(p) for p in postings.values()), dtype=np.int64, count=len(postings))
+        self.term_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(posting_lengths, out=self.term_offsets[1:])
+
+        total_postings = int(self.term_offsets[-1])
+        self.posting_docs = np.fromiter(
+            (doc for p in postings.values() for doc, _ in p), dtype=np.int32, count=total_postings
+        )
+        self.posting_tfs = np.fromiter(
+            (tf for p in postings.values() for _, tf in p), dtype=np.float32, count=total_postings
+        )
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self._precompute()
+
+    def _precompute(self) -> None:
+        """Derive the query-independent BM25 factors from the raw arrays."""
+        num_passages = len(self.passages)
+        document_frequency = np.diff(self.term_offsets).astype(np.float32)
+        self.idf = np.log1p((num_passages - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        avg_length = float(self.doc_lengths.mean()) if num_passages else 0.0
+        if avg_length > 0:
+            self.length_norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / avg_length)
+        else:
+            self.length_norms = np.full(num_passages, self.k1, dtype=np.float32)
+
+    # Arrays that fully describe a built index, for storing it in a snapshot
+    ARRAY_FIELDS = ("term_offsets", "posting_docs", "posting_tfs", "doc_lengths", "idf", "length_norms")
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Return the index arrays by name; see from_arrays."""
+        return {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, passages: List[Passage], vocabulary: Dict[str, int], arrays: Dict[str, np.ndarray],
+                    k1: float = 1.2, b: float = 0.75) -> "RetrievalIndex":
+        """
+        Restore an index from the output of to_arrays without re-tokenizing.
+
+        The arrays are used as given, so they may be read-only views of a
+        memory-mapped file.
+        """
+        index = cls.__new__(cls)
+        index.passages = passages
+        index.vocabulary = vocabulary
+        index.k1 = k1
+        index.b = b
+        for name in cls.ARRAY_FIELDS:
+            setattr(index, name, arrays[name])
+        return index
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: Dict[str, Any]) -> "RetrievalIndex":
+        """Build an index over every passage of a parsed knowledge base."""
+        index = cls(flatten_knowledge_base(knowledge_base))
+        logger.info("Built retrieval index: %d passages, %d terms", len(index.passages), len(index.vocabulary))
+        return index
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        Compute the BM25 score of every passage for a query.
+
+        Args:
+            query: The user's query
+
+        Returns:
+            A float32 array with one score per passage
+        """
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids:
+            return np.zeros(len(self.passages), dtype=np.float32)
+
+        slices = [np.arange(self.term_offsets[t], self.term_offsets[t + 1]) for t in term_ids]
+        positions = np.concatenate(slices)
+        term_idf = np.repeat(self.idf[term_ids], [len(s) for s in slices])
+
+        docs = self.posting_docs[positions]
+        tfs = self.posting_tfs[positions]
+        weights = term_idf * tfs * (self.k1 + 1) / (tfs + self.length_norms[docs])
+
+        return np.bincount(docs, weights=weights, minlength=len(self.passages)).astype(np.float32)
+
+    def search(self, query: str, top_k: int = 10) -> List[SearchHit]:
+        """
+        Rank passages against a query.
+
+        Args:
+            query: The user's query
+            top_k: The maximum number of hits to return
+
+        Returns:
+            The best matching passages, highest score first
+        """
+        scores = self.score(query)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        # Stable sort keeps document order among equal scores
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [SearchHit(self.passages[i], float(scores[i])) for i in ranked]
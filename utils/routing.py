@@ -0,0 +1,122 @@
+import statistics
+import threading
+import time
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from utils import knowledge_state
+from utils.nlp_processor import normalize_terms
+
+LOCAL = "local"
+REMOTE = "remote"
+
+
+class RouteDecision(NamedTuple):
+    """Where a query is answered, and why."""
+    backend: str
+    score: float
+    topic: Optional[str]
+    reason: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "score": round(self.score, 3), "topic": self.topic, "reason": self.reason}
+
+
+class ConfidenceRouter:
+    """
+    Decides whether the local knowledge base can answer a query or it should go to the remote backend.
+
+    Confidence is the BM25 score of the best matching passage for the user's
+    normalized words, without the context preprocess_query adds. A query that
+    names a knowledge base topic needs only ``min_topic_score``; any other
+    query needs ``min_score``. Queries below their threshold are treated as
+    off-topic or poorly covered and escalated.
+    """
+
+    def __init__(self, min_score: float = 5.0, min_topic_score: float = 1.0):
+        self.min_score = min_score
+        self.min_topic_score = min_topic_score
+        self._lock = threading.Lock()
+        self.decisions = {LOCAL: 0, REMOTE: 0}
+
+    def route(self, message: str) -> RouteDecision:
+        """Route a raw user message."""
+        return self.route_normalized(normalize_terms(message.lower()))
+
+    def route_normalized(self, text: str) -> RouteDecision:
+        """Route a message that has already been lowercased and normalized."""
+        state = knowledge_state.current()
+        hits = state.index.search(text, 1)
+        score = hits[0].score if hits else 0.0
+        topic = next((match.key for match in state.matcher.find_all(text) if match.kind == "topic"), None)
+
+        if topic is not None and score >= self.min_topic_score:
+            decision = RouteDecision(LOCAL, score, topic, "topic match")
+        elif score >= self.min_score:
+            decision = RouteDecision(LOCAL, score, hits[0].passage.topic, "retrieval score")
+        else:
+            decision = RouteDecision(REMOTE, score, topic, "low confidence")
+
+        with self._lock:
+            self.decisions[decision.backend] += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "min_score": self.min_score,
+                "min_topic_score": self.min_topic_score,
+                "decisions": dict(self.decisions),
+            }
+
+
+def evaluate_routing(queries: Iterable[str], router: ConfidenceRouter, answer_locally,
+                     remote_latency_ms: float) -> Dict[str, Any]:
+    """
+    Replay queries through a router and estimate what routing would save.
+
+    The local answer is produced and timed for every query routed locally;
+    remote calls are not made and are assumed to take ``remote_latency_ms``.
+    The baseline sends every query to the remote backend.
+
+    Args:
+        queries: Normalized user queries, as returned by strip_query_context
+        router: The router to evaluate
+        answer_locally: Answers one query from the local knowledge base
+        remote_latency_ms: Expected latency of one remote call
+
+    Returns:
+        Counts, the remote call rate, score quantiles and the estimated
+        latency saving
+    """
+    total = 0
+    reasons: Dict[str, int] = {}
+    scores = []
+    local_ms = []
+    for query in queries:
+        total += 1
+        decision = router.route_normalized(query)
+        reasons[decision.reason] = reasons.get(decision.reason, 0) + 1
+        scores.append(decision.score)
+        if decision.backend == LOCAL:
+            start = time.perf_counter()
+            answer_locally(query)
+            local_ms.append((time.perf_counter() - start) * 1000)
+
+    if total == 0:
+        return {"queries": 0}
+
+    remote = total - len(local_ms)
+    routed_ms = sum(local_ms) + remote * remote_latency_ms
+    baseline_ms = total * remote_latency_ms
+    return {
+        "queries": total,
+        "local": len(local_ms),
+        "remote": remote,
+        "remote_call_rate": remote / total,
+        "reasons": reasons,
+        "score_quantiles": statistics.quantiles(scores, n=4) if total > 1 else scores,
+        "mean_local_ms": statistics.mean(local_ms) if local_ms else 0.0,
+        "mean_latency_ms": routed_ms / total,
+        "baseline_mean_latency_ms": baseline_ms / total,
+        "latency_saving": 1 - routed_ms / baseline_ms if baseline_ms else 0.0,
+    }
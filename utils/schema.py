@@ -0,0 +1,51 @@
+import logging
+import uuid
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per statement when backfilling a new column
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _add_chat_query_public_id(engine: Engine) -> None:
+    """Add ChatQuery.public_id to a table created before it existed and give every row one."""
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE chat_query ADD COLUMN public_id VARCHAR(32)"))
+        ids = connection.execute(text("SELECT id FROM chat_query WHERE public_id IS NULL")).scalars().all()
+        for start in range(0, len(ids), BACKFILL_BATCH_SIZE):
+            connection.execute(
+                text("UPDATE chat_query SET public_id = :public_id WHERE id = :id"),
+                [{"id": row_id, "public_id": uuid.uuid4().hex} for row_id in ids[start:start + BACKFILL_BATCH_SIZE]],
+            )
+    logger.info("Added chat_query.public_id and backfilled %d rows", len(ids))
+
+
+# Columns added to existing tables after their first release, oldest first:
+# (table, column, migration). db.create_all() only creates missing tables, so
+# each migration runs once against a database whose table lacks the column.
+COLUMN_MIGRATIONS = [
+    ("chat_query", "public_id", _add_chat_query_public_id),
+]
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Bring tables created by earlier versions of the app up to the current models.
+
+    Run after db.create_all() and before indexes are created, since new
+    indexes may cover the added columns.
+
+    Args:
+        engine: The database to upgrade
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table, column, migrate in COLUMN_MIGRATIONS:
+        if table not in tables:
+            continue
+        if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+            migrate(engine)
+            inspector.clear_cache()
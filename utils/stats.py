@@ -0,0 +1,230 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from utils.process_local import ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+# Names of the rows in StatCounter
+TOTAL_USERS = "total_users"
+TOTAL_QUERIES = "total_queries"
+LAST_RECONCILED = "last_reconciled"
+
+# Every chat insert adds to the query total, so it is spread over this many
+# rows, each write picking one at random, and summed on read. A single row
+# would serialize the commits of every worker thread on its row lock.
+TOTAL_QUERIES_SHARDS = 16
+
+# Key of the PostgreSQL advisory lock held while reconciling
+RECONCILE_LOCK_ID = 0x5354415453
+
+
+def _total_queries_shards() -> List[str]:
+    # The first shard keeps the original row's name
+    return [TOTAL_QUERIES] + [f"{TOTAL_QUERIES}:{shard}" for shard in range(1, TOTAL_QUERIES_SHARDS)]
+
+
+def _upsert_add(session, model, key_column: str, key: Any, value_column: str, amount: int) -> None:
+    """Add ``amount`` to a counter row, creating the row if it does not exist."""
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        statement = dialect_insert(model).values({key_column: key, value_column: amount})
+        statement = statement.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={value_column: getattr(model, value_column) + amount},
+        )
+        session.execute(statement)
+        return
+
+    result = session.execute(
+        update(model)
+        .where(getattr(model, key_column) == key)
+        .values({value_column: getattr(model, value_column) + amount})
+    )
+    if result.rowcount == 0:
+        session.add(model(**{key_column: key, value_column: amount}))
+
+
+def _set_counter(session, name: str, value: int) -> None:
+    from models import StatCounter
+    counter = session.get(StatCounter, name)
+    if counter is None:
+        session.add(StatCounter(name=name, value=value))
+    else:
+        counter.value = value
+
+
+def record_user_created(session) -> None:
+    """Count a new user; call before committing the session that adds it."""
+    from models import StatCounter
+    _upsert_add(session, StatCounter, "name", TOTAL_USERS, "value", 1)
+
+
+def record_chat_queries(session, user_ids: Iterable[Optional[int]]) -> None:
+    """
+    Count newly written chat queries; call before committing the session that adds them.
+
+    Args:
+        session: The session the ChatQuery rows are written in
+        user_ids: The user_id of each new row (None for anonymous users)
+    """
+    from models import StatCounter, UserQueryCount
+
+    per_user = Counter(user_ids)
+    total = sum(per_user.values())
+    if not total:
+        return
+
+    shard = random.choice(_total_queries_shards())
+    _upsert_add(session, StatCounter, "name", shard, "value", total)
+    for user_id, count in per_user.items():
+        if user_id is not None:
+            _upsert_add(session, UserQueryCount, "user_id", user_id, "query_count", count)
+
+
+def active_users_statement(top_users: int = 5):
+    """Build the query for the most active users, as (User, query_count) rows."""
+    from models import User, UserQueryCount
+    return (
+        select(User, UserQueryCount.query_count)
+        .join(UserQueryCount, UserQueryCount.user_id == User.id)
+        .where(UserQueryCount.query_count > 0)
+        .order_by(UserQueryCount.query_count.desc())
+        .limit(top_users)
+    )
+
+
+def get_dashboard_stats(session, top_users: int = 5) -> Dict[str, Any]:
+    """
+    Read the dashboard statistics from the rollup tables.
+
+    Returns:
+        A dict with total_users, total_queries and active_users, the latter a
+        list of (User, query_count) pairs, most active first
+    """
+    from models import StatCounter
+
+    query_shards = _total_queries_shards()
+    counters = dict(session.execute(
+        select(StatCounter.name, StatCounter.value).where(StatCounter.name.in_([TOTAL_USERS] + query_shards))
+    ).all())
+    active_users = session.execute(active_users_statement(top_users)).all()
+
+    return {
+        "total_users": counters.get(TOTAL_USERS, 0),
+        "total_queries": sum(counters.get(name, 0) for name in query_shards),
+        "active_users": active_users,
+    }
+
+
+def reconcile_stats(session) -> None:
+    """
+    Recompute every rollup from the source tables and commit.
+
+    This is a full scan, so it runs periodically rather than per request. An
+    increment committed while it runs may be overwritten and is picked up
+    again by the next reconciliation.
+    """
+    from models import ChatQuery, StatCounter, User, UserQueryCount
+
+    started = time.monotonic()
+    total_users = session.scalar(select(func.count(User.id)))
+    total_queries = session.scalar(select(func.count(ChatQuery.id)))
+    per_user = dict(session.execute(
+        select(ChatQuery.user_id, func.count(ChatQuery.id))
+        .where(ChatQuery.user_id.isnot(None))
+        .group_by(ChatQuery.user_id)
+    ).all())
+
+    _set_counter(session, TOTAL_USERS, total_users)
+    _set_counter(session, TOTAL_QUERIES, total_queries)
+    session.execute(delete(StatCounter).where(StatCounter.name.in_(_total_queries_shards()[1:])))
+    _set_counter(session, LAST_RECONCILED, int(time.time()))
+
+    # Rewrite the per-user rollup in the same transaction as the counters
+    session.execute(delete(UserQueryCount))
+    if per_user:
+        session.execute(insert(UserQueryCount), [
+            {"user_id": user_id, "query_count": count} for user_id, count in per_user.items()
+        ])
+
+    session.commit()
+    logger.info("Reconciled statistics in %.2fs: %d users, %d queries",
+                time.monotonic() - started, total_users, total_queries)
+
+
+def reconcile_stats_if_due(session, max_age: float) -> bool:
+    """
+    Reconcile unless another process already has within the last ``max_age`` seconds.
+
+    Every worker runs a reconciler, but one full recompute per interval is
+    enough: on PostgreSQL the workers take turns through an advisory lock held
+    until the reconciliation commits, and each skips the work when the last
+    reconciliation is recent.
+
+    Returns:
+        True when this call reconciled the statistics
+    """
+    from models import StatCounter
+
+    if session.get_bind().dialect.name == "postgresql":
+        if not session.scalar(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_ID))):
+            session.rollback()
+            return False
+
+    last_reconciled = session.scalar(select(StatCounter.value).where(StatCounter.name == LAST_RECONCILED))
+    if last_reconciled is not None and time.time() - last_reconciled < max_age:
+        session.rollback()
+        return False
+
+    reconcile_stats(session)
+    return True
+
+
+def stats_need_bootstrap(session) -> bool:
+    """True when the rollups have never been computed."""
+    from models import StatCounter
+    return session.get(StatCounter, LAST_RECONCILED) is None
+
+
+class StatsReconciler:
+    """
+    Background thread that keeps the rollups reconciled every ``interval`` seconds.
+
+    Each worker process runs one, and they share the work through
+    reconcile_stats_if_due(). With ``interval`` 0 the thread is not started;
+    run ``flask reconcile-stats`` from cron instead.
+    """
+
+    def __init__(self, app, session, interval: float):
+        self.app = app
+        self.session = session
+        self.interval = interval
+        self._thread = ProcessLocal(self._start_thread)
+
+    def ensure_started(self) -> None:
+        """Start the thread in the current process; a no-op when already running or disabled."""
+        if self.interval > 0:
+            self._thread.get()
+
+    def _start_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self._run, name="stats-reconciler", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    reconcile_stats_if_due(self.session, max_age=self.interval / 2)
+            except Exception:
+                logger.exception("Statistics reconciliation failed")
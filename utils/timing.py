@@ -0,0 +1,156 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+# Stages of the chat pipeline, in the order they run. This is the only place
+# stages are declared: histograms, reports and the Server-Timing header all
+# follow this tuple.
+STAGES = (
+    ("cache_lookup", "Response cache lookup"),
+    ("preprocess", "Query preprocessing"),
+    ("assemble_messages", "Message history assembly"),
+    ("route", "Local or remote answer routing"),
+    ("chat_response", "Answer generation"),
+    ("relevant_info", "Knowledge base retrieval and rendering"),
+    ("store", "Chat query storage"),
+)
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKET_BOUNDS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; the last bucket counts everything above the largest bound."""
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKET_BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.bounds, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = dict(zip([str(bound) for bound in self.bounds] + ["+Inf"], self.counts))
+            count, total = self.count, self.total
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 3) if count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+
+
+class StageTimer:
+    """
+    Records how long each pipeline stage takes, per request and in aggregate.
+
+    Durations go into one histogram per stage and, inside a request, into
+    per-request totals used for the Server-Timing header. A stage that runs
+    several times in one request, as in a batch, is reported once with its
+    summed duration and call count, so the header stays bounded by the
+    number of stages. When disabled, stage() does nothing beyond a flag check.
+    """
+
+    def __init__(self, stages=STAGES, enabled: bool = True):
+        self.descriptions = dict(stages)
+        self.histograms = {name: Histogram() for name, _ in stages}
+        self.enabled = enabled
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of a with-block as the named stage."""
+        if not self.enabled:
+            yield
+            return
+        histogram = self.histograms[name]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            histogram.observe(elapsed_ms)
+            if has_request_context():
+                totals = g.setdefault("stage_timings", {}).setdefault(name, [0.0, 0])
+                totals[0] += elapsed_ms
+                totals[1] += 1
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of stage()."""
+        self.histograms[name]  # fail at import time for undeclared stages
+
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def server_timing_header(self) -> str:
+        """Format the current request's stage durations as a Server-Timing header value."""
+        timings: Dict[str, List[float]] = g.get("stage_timings", {})
+        entries = []
+        for name, (elapsed_ms, calls) in timings.items():
+            description = self.descriptions[name] + (f" x{calls}" if calls > 1 else "")
+            entries.append(f'{name};dur={elapsed_ms:.2f};desc="{description}"')
+        return ", ".join(entries)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "stages": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def install(self, app) -> None:
+        """Add the Server-Timing header to responses of requests that timed any stage."""
+        @app.after_request
+        def _add_server_timing(response):
+            if self.enabled and g.get("stage_timings"):
+                response.headers["Server-Timing"] = self.server_timing_header()
+            return response
+
+
+# Shared by the app and the modules whose functions it times
+stage_timer = StageTimer()
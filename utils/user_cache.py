@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class UserSnapshot(NamedTuple):
+    """
+    Read-only copy of the User fields that requests need.
+
+    Implements the Flask-Login user interface so it can be returned from the
+    user_loader in place of a live ORM object.
+    """
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(user.id, user.username, user.email, bool(user.is_admin))
+
+
+class UserCache:
+    """
+    Per-process cache of UserSnapshots keyed by user ID.
+
+    Entries expire ``ttl`` seconds after they are loaded, so changes made by
+    other worker processes are seen within that time; changes made in this
+    process invalidate the entry immediately (see invalidate_on_change).
+    A ``ttl`` of 0 disables caching.
+    """
+
+    def __init__(self, load: Callable[[int], Any], maxsize: int = 10000, ttl: float = 30):
+        self.load = load
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, UserSnapshot]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[UserSnapshot]:
+        """
+        Return the snapshot for a user, loading it on a miss.
+
+        Args:
+            user_id: The user's primary key
+
+        Returns:
+            The snapshot, or None if the user does not exist
+        """
+        now = time.monotonic()
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return entry[1]
+
+        user = self.load(user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+
+        if self.ttl > 0:
+            with self._lock:
+                self.misses += 1
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def invalidate_on_change(self, model) -> None:
+        """Drop a user's entry whenever this process updates or deletes the row."""
+        def _invalidate(mapper, connection, target):
+            self.invalidate(target.id)
+
+        event.listen(model, "after_update", _invalidate)
+        event.listen(model, "after_delete", _invalidate)
@@ -0,0 +1,128 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List
+
+from utils.process_local import ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-memory queue whose rows are bulk-written by a background thread.
+
+    Rows are flushed when ``batch_size`` of them are waiting or when
+    ``flush_interval`` seconds have passed, whichever comes first. When the queue
+    is full, ``submit`` waits up to ``put_timeout`` seconds for room and then
+    writes the row on the caller's thread, so producers slow down to the pace of
+    the database instead of dropping records.
+    """
+
+    def __init__(
+        self,
+        write_rows: Callable[[List[Dict[str, Any]]], None],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        put_timeout: float = 0.5,
+    ):
+        self.write_rows = write_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = ProcessLocal(self._start_thread)
+        self.written = 0
+        self.failed = 0
+        self.overflowed = 0
+
+    def _start_thread(self) -> threading.Thread:
+        """Start the flusher thread; each gunicorn worker runs its own."""
+        self._stopping.clear()
+        thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        """
+        Queue a row for writing.
+
+        Args:
+            row: Column values for one record
+        """
+        self._thread.get()
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            self.overflowed += 1
+            logger.warning("Write-behind queue is full; writing row synchronously")
+            with self._write_lock:
+                self._write([row])
+            return
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Write one batch; the caller holds the write lock."""
+        try:
+            self.write_rows(rows)
+            self.written += len(rows)
+        except Exception:
+            self.failed += len(rows)
+            logger.exception("Failed to write %d queued rows", len(rows))
+
+    def flush(self) -> int:
+        """
+        Write every queued row now.
+
+        Waits for a batch that another thread is already writing, so every row
+        submitted before the call is in the database when it returns.
+
+        Returns:
+            The number of rows written by this call
+        """
+        total = 0
+        with self._write_lock:
+            while True:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return total
+                self._write(rows)
+                total += len(rows)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            # Wake up when a full batch is waiting or the interval has passed
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write whatever is still queued."""
+        self._stopping.set()
+        self._wakeup.set()
+        thread = self._thread.peek()
+        if thread is not None:
+            thread.join(timeout=5)
+        written = self.flush()
+        if written:
+            logger.info("Flushed %d queued rows on shutdown", written)
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and write counters."""
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "overflowed": self.overflowed,
+        }